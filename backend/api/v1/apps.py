@@ -2,9 +2,9 @@ from fastapi import APIRouter, Depends, status
 from typing import List
 
 from api.v1.schemas import AppMetadata, AppPermission
+from apps.framework.permissions import get_user_permissions
 from apps.framework.registry import get_registry
-from core.deps import get_current_user
-from db.postgres import get_pool
+from core.deps import RequestConnection, get_current_user, get_db
 
 router = APIRouter(prefix="/apps", tags=["apps"])
 
@@ -32,7 +32,10 @@ async def list_apps():
 
 
 @router.get("/permissions", response_model=List[AppPermission])
-async def get_my_permissions(current_user: dict = Depends(get_current_user)):
+async def get_my_permissions(
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
+):
     """
     Get current user's app permissions.
 
@@ -41,6 +44,7 @@ async def get_my_permissions(current_user: dict = Depends(get_current_user)):
 
     Args:
         current_user: Current authenticated user from dependency
+        db: Request connection, shared with get_current_user
 
     Returns:
         List of app permissions with app_id and has_access
@@ -49,19 +53,8 @@ async def get_my_permissions(current_user: dict = Depends(get_current_user)):
     registry = get_registry()
     apps = registry.all()
 
-    # Fetch all explicit permissions for this user
-    async with get_pool().acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT app_id, has_access
-            FROM user_app_permissions
-            WHERE user_id = $1
-            """,
-            user_id,
-        )
-
-    # Build a map of explicit permissions
-    explicit_permissions = {row["app_id"]: row["has_access"] for row in rows}
+    # Fetch all explicit permissions for this user (cached per process)
+    explicit_permissions = await get_user_permissions(user_id, db)
 
     # For each registered app, use explicit permission if exists, otherwise default_access
     permissions = []
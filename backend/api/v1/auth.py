@@ -1,3 +1,4 @@
+import asyncpg
 from fastapi import APIRouter, Depends, HTTPException, Response, status
 
 from api.v1.schemas import (
@@ -10,36 +11,58 @@ from api.v1.schemas import (
 from core.config import settings
 from core.deps import get_current_user, get_refresh_token
 from core.security import (
+    HashingBusyError,
     create_access_token,
     create_refresh_token,
-    hash_password,
-    verify_password,
+    get_hashing_pool,
+    needs_rehash,
 )
 from db.postgres import get_pool
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _email_taken() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Email already registered",
+    )
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(data: UserRegister):
     async with get_pool().acquire() as conn:
         existing = await conn.fetchrow("SELECT id FROM users WHERE email = $1", data.email)
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered",
+    if existing:
+        raise _email_taken()
+
+    # Hash without holding a pool connection
+    try:
+        password_hash = await get_hashing_pool().hash(data.password)
+    except HashingBusyError:
+        raise _hashing_busy()
+
+    try:
+        async with get_pool().acquire() as conn:
+            user = await conn.fetchrow(
+                """
+                INSERT INTO users (email, password_hash)
+                VALUES ($1, $2)
+                RETURNING id, email
+                """,
+                data.email,
+                password_hash,
             )
-
-        password_hash = hash_password(data.password)
-        user = await conn.fetchrow(
-            """
-            INSERT INTO users (email, password_hash)
-            VALUES ($1, $2)
-            RETURNING id, email
-            """,
-            data.email,
-            password_hash,
-        )
+    except asyncpg.UniqueViolationError:
+        raise _email_taken()
 
     return UserResponse(id=str(user["id"]), email=user["email"])
 
@@ -52,13 +75,38 @@ async def login(data: UserLogin, response: Response):
             data.email,
         )
 
-    if not user or not verify_password(data.password, user["password_hash"]):
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid email or password",
+        )
+
+    hashing_pool = get_hashing_pool()
+    try:
+        valid = await hashing_pool.verify(data.password, user["password_hash"])
+    except HashingBusyError:
+        raise _hashing_busy()
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
 
     user_id = str(user["id"])
+
+    # Upgrade hashes made with older Argon2 parameters; best effort only
+    if needs_rehash(user["password_hash"]):
+        try:
+            password_hash = await hashing_pool.hash(data.password)
+            async with get_pool().acquire() as conn:
+                await conn.execute(
+                    "UPDATE users SET password_hash = $1, updated_at = NOW() WHERE id = $2",
+                    password_hash,
+                    user["id"],
+                )
+        except HashingBusyError:
+            pass
     access_token = create_access_token(user_id)
     refresh_token = create_refresh_token(user_id)
 
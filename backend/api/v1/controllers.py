@@ -2,23 +2,37 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
 
 from api.v1.schemas import (
     ControllerCreate,
+    ControllerHeartbeatSummary,
     ControllerResponse,
     ControllerUpdate,
     DiscoveredController,
     EntityState,
+    HeartbeatHistoryResponse,
     MessageResponse,
+    ReadingsResponse,
     TestConnectionRequest,
     TestConnectionResponse,
 )
+from apps.command_center.audit import get_audit_sink
+from apps.connection_manager import reschedule_controller
 from apps.discovery import discover_home_assistant
-from apps.ha_client import HomeAssistantClient, test_ha_connection
-from core.deps import get_current_user
-from core.encryption import decrypt_token, encrypt_token
-from db.postgres import get_pool
+from apps.entities import etag_matches, get_entity_listing, invalidate_entity_cache
+from apps.ha_client import test_ha_connection
+from apps.ha_gateway import get_gateway
+from apps.heartbeat_history import (
+    HistoryTotals,
+    fetch_history_rows,
+    history_points,
+    summarize_by_controller,
+)
+from apps.readings import count_points, default_range, fetch_readings
+from core.config import settings
+from core.deps import RequestConnection, get_current_user, get_db
+from core.encryption import encrypt_token, evict_token
 
 router = APIRouter(prefix="/controllers", tags=["controllers"])
 
@@ -41,37 +55,93 @@ def _row_to_controller(row: dict) -> ControllerResponse:
 
 
 @router.get("", response_model=List[ControllerResponse])
-async def list_controllers(current_user: dict = Depends(get_current_user)):
+async def list_controllers(
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
+):
     """List all controllers for the current user."""
-    async with get_pool().acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT id, user_id, name, url, connection_status, last_seen,
-                   last_error, ha_version, discovered_via, created_at, updated_at
-            FROM master_controllers
-            WHERE user_id = $1
-            ORDER BY created_at DESC
-            """,
-            current_user["id"],
-        )
+    conn = await db.acquire()
+    rows = await conn.fetch(
+        """
+        SELECT id, user_id, name, url, connection_status, last_seen,
+               last_error, ha_version, discovered_via, created_at, updated_at
+        FROM master_controllers
+        WHERE user_id = $1
+        ORDER BY created_at DESC
+        """,
+        current_user["id"],
+    )
 
     return [_row_to_controller(row) for row in rows]
 
 
+@router.get("/heartbeats", response_model=List[ControllerHeartbeatSummary])
+async def get_fleet_heartbeats(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = Query("1h", pattern="^(1h|1d)$"),
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
+):
+    """
+    Get uptime and probe latency for each of the user's controllers over a range.
+
+    Served from the hourly or daily heartbeat aggregates; uptime is weighted by
+    time between probes, and percentiles are approximate.
+    """
+    start, end = default_range(start, end)
+
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end",
+        )
+
+    conn = await db.acquire()
+    controllers = await conn.fetch(
+        """
+        SELECT id, name, connection_status
+        FROM master_controllers
+        WHERE user_id = $1
+        ORDER BY created_at DESC
+        """,
+        current_user["id"],
+    )
+    rows = await fetch_history_rows(
+        conn, [controller["id"] for controller in controllers], start, end, resolution
+    )
+    summaries = summarize_by_controller(rows)
+
+    empty = HistoryTotals().to_dict()
+    return [
+        ControllerHeartbeatSummary(
+            controller_id=str(controller["id"]),
+            name=controller["name"],
+            connection_status=controller["connection_status"],
+            **summaries.get(str(controller["id"]), empty),
+        )
+        for controller in controllers
+    ]
+
+
 @router.get("/{controller_id}", response_model=ControllerResponse)
-async def get_controller(controller_id: UUID, current_user: dict = Depends(get_current_user)):
+async def get_controller(
+    controller_id: UUID,
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
+):
     """Get a specific controller by ID."""
-    async with get_pool().acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT id, user_id, name, url, connection_status, last_seen,
-                   last_error, ha_version, discovered_via, created_at, updated_at
-            FROM master_controllers
-            WHERE id = $1 AND user_id = $2
-            """,
-            controller_id,
-            current_user["id"],
-        )
+    conn = await db.acquire()
+    row = await conn.fetchrow(
+        """
+        SELECT id, user_id, name, url, connection_status, last_seen,
+               last_error, ha_version, discovered_via, created_at, updated_at
+        FROM master_controllers
+        WHERE id = $1 AND user_id = $2
+        """,
+        controller_id,
+        current_user["id"],
+    )
 
     if not row:
         raise HTTPException(
@@ -84,10 +154,14 @@ async def get_controller(controller_id: UUID, current_user: dict = Depends(get_c
 
 @router.post("", response_model=ControllerResponse, status_code=status.HTTP_201_CREATED)
 async def create_controller(
-    data: ControllerCreate, current_user: dict = Depends(get_current_user)
+    request: Request,
+    data: ControllerCreate,
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
 ):
     """Create a new controller."""
-    # Test connection before saving
+    # Test connection before saving; don't hold a pool connection while waiting on it
+    await db.release()
     success, error, version = await test_ha_connection(data.url, data.access_token)
 
     if not success:
@@ -99,139 +173,199 @@ async def create_controller(
     # Encrypt the access token
     encrypted_token = encrypt_token(data.access_token)
 
-    async with get_pool().acquire() as conn:
-        # Check for duplicate URL for this user
-        existing = await conn.fetchrow(
-            "SELECT id FROM master_controllers WHERE user_id = $1 AND url = $2",
-            current_user["id"],
-            data.url,
-        )
+    conn = await db.acquire()
+    # Check for duplicate URL for this user
+    existing = await conn.fetchrow(
+        "SELECT id FROM master_controllers WHERE user_id = $1 AND url = $2",
+        current_user["id"],
+        data.url,
+    )
 
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="A controller with this URL already exists",
-            )
-
-        # Insert the new controller
-        row = await conn.fetchrow(
-            """
-            INSERT INTO master_controllers
-                (user_id, name, url, access_token_encrypted, connection_status,
-                 last_seen, ha_version, discovered_via)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-            RETURNING id, user_id, name, url, connection_status, last_seen,
-                      last_error, ha_version, discovered_via, created_at, updated_at
-            """,
-            current_user["id"],
-            data.name,
-            data.url,
-            encrypted_token,
-            "online",
-            datetime.utcnow(),
-            version,
-            data.discovered_via,
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A controller with this URL already exists",
         )
 
+    # Insert the new controller
+    row = await conn.fetchrow(
+        """
+        INSERT INTO master_controllers
+            (user_id, name, url, access_token_encrypted, connection_status,
+             last_seen, ha_version, discovered_via)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+        RETURNING id, user_id, name, url, connection_status, last_seen,
+                  last_error, ha_version, discovered_via, created_at, updated_at
+        """,
+        current_user["id"],
+        data.name,
+        data.url,
+        encrypted_token,
+        "online",
+        datetime.utcnow(),
+        version,
+        data.discovered_via,
+    )
+
+    # Start polling (and streaming) it right away rather than at the next fleet reload
+    await reschedule_controller(row["id"])
+
+    get_audit_sink().record(
+        "controller.create",
+        current_user["id"],
+        "controller",
+        row["id"],
+        {"name": data.name, "url": data.url},
+        request,
+    )
+
     return _row_to_controller(row)
 
 
 @router.patch("/{controller_id}", response_model=ControllerResponse)
 async def update_controller(
-    controller_id: UUID, data: ControllerUpdate, current_user: dict = Depends(get_current_user)
+    request: Request,
+    controller_id: UUID,
+    data: ControllerUpdate,
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
 ):
     """Update a controller."""
-    async with get_pool().acquire() as conn:
-        # Verify ownership
-        existing = await conn.fetchrow(
-            "SELECT id FROM master_controllers WHERE id = $1 AND user_id = $2",
-            controller_id,
-            current_user["id"],
+    conn = await db.acquire()
+    # Verify ownership
+    existing = await conn.fetchrow(
+        "SELECT id, access_token_encrypted FROM master_controllers WHERE id = $1 AND user_id = $2",
+        controller_id,
+        current_user["id"],
+    )
+
+    if not existing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Controller not found",
         )
 
-        if not existing:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Controller not found",
-            )
-
-        # Build update query dynamically
-        updates = []
-        values = []
-        param_count = 1
-
-        if data.name is not None:
-            updates.append(f"name = ${param_count}")
-            values.append(data.name)
-            param_count += 1
-
-        if data.url is not None:
-            updates.append(f"url = ${param_count}")
-            values.append(data.url)
-            param_count += 1
-
-        if data.access_token is not None:
-            encrypted_token = encrypt_token(data.access_token)
-            updates.append(f"access_token_encrypted = ${param_count}")
-            values.append(encrypted_token)
-            param_count += 1
-
-        if not updates:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No fields to update",
-            )
-
-        # Add updated_at
-        updates.append(f"updated_at = ${param_count}")
-        values.append(datetime.utcnow())
+    # Build update query dynamically
+    updates = []
+    values = []
+    param_count = 1
+
+    if data.name is not None:
+        updates.append(f"name = ${param_count}")
+        values.append(data.name)
         param_count += 1
 
-        # Add controller_id for WHERE clause
-        values.append(controller_id)
+    if data.url is not None:
+        updates.append(f"url = ${param_count}")
+        values.append(data.url)
+        param_count += 1
 
-        query = f"""
-            UPDATE master_controllers
-            SET {', '.join(updates)}
-            WHERE id = ${param_count}
-            RETURNING id, user_id, name, url, connection_status, last_seen,
-                      last_error, ha_version, discovered_via, created_at, updated_at
-        """
+    if data.access_token is not None:
+        encrypted_token = encrypt_token(data.access_token)
+        updates.append(f"access_token_encrypted = ${param_count}")
+        values.append(encrypted_token)
+        param_count += 1
 
-        row = await conn.fetchrow(query, *values)
+    if not updates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update",
+        )
+
+    # Add updated_at
+    updates.append(f"updated_at = ${param_count}")
+    values.append(datetime.utcnow())
+    param_count += 1
+
+    # Add controller_id for WHERE clause
+    values.append(controller_id)
+
+    query = f"""
+        UPDATE master_controllers
+        SET {', '.join(updates)}
+        WHERE id = ${param_count}
+        RETURNING id, user_id, name, url, connection_status, last_seen,
+                  last_error, ha_version, discovered_via, created_at, updated_at
+    """
+
+    row = await conn.fetchrow(query, *values)
+
+    # Drop the live mirror; the heartbeat reopens it with the new URL/token
+    get_gateway().untrack(controller_id)
+    await invalidate_entity_cache(controller_id)
+    if data.access_token is not None:
+        await evict_token(existing["access_token_encrypted"])
+    await reschedule_controller(controller_id)
+
+    # Record which fields changed, never the token itself
+    get_audit_sink().record(
+        "controller.update",
+        current_user["id"],
+        "controller",
+        controller_id,
+        {"fields": sorted(data.model_dump(exclude_none=True))},
+        request,
+    )
 
     return _row_to_controller(row)
 
 
 @router.delete("/{controller_id}", response_model=MessageResponse)
-async def delete_controller(controller_id: UUID, current_user: dict = Depends(get_current_user)):
+async def delete_controller(
+    request: Request,
+    controller_id: UUID,
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
+):
     """Delete a controller."""
-    async with get_pool().acquire() as conn:
-        result = await conn.execute(
-            "DELETE FROM master_controllers WHERE id = $1 AND user_id = $2",
-            controller_id,
-            current_user["id"],
-        )
+    conn = await db.acquire()
+    deleted = await conn.fetchrow(
+        """
+        DELETE FROM master_controllers WHERE id = $1 AND user_id = $2
+        RETURNING access_token_encrypted
+        """,
+        controller_id,
+        current_user["id"],
+    )
 
-    if result == "DELETE 0":
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Controller not found",
         )
 
+    get_gateway().untrack(controller_id)
+    await invalidate_entity_cache(controller_id)
+    await evict_token(deleted["access_token_encrypted"])
+    # The owning worker finds it gone on the re-check and closes its stream
+    await reschedule_controller(controller_id)
+
+    get_audit_sink().record(
+        "controller.delete", current_user["id"], "controller", controller_id, request=request
+    )
+
     return MessageResponse(message="Controller deleted successfully")
 
 
 @router.post("/discover", response_model=List[DiscoveredController])
-async def discover_controllers(current_user: dict = Depends(get_current_user)):
+async def discover_controllers(
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
+):
     """Discover Home Assistant instances on the local network."""
+    await db.release()
     discovered = await discover_home_assistant(timeout=5)
     return discovered
 
 
 @router.post("/test-connection", response_model=TestConnectionResponse)
-async def test_connection(data: TestConnectionRequest, current_user: dict = Depends(get_current_user)):
+async def test_connection(
+    data: TestConnectionRequest,
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
+):
     """Test connection to a Home Assistant instance."""
+    await db.release()
     success, error, version = await test_ha_connection(data.url, data.access_token)
 
     return TestConnectionResponse(success=success, error=error, version=version)
@@ -241,20 +375,26 @@ async def test_connection(data: TestConnectionRequest, current_user: dict = Depe
 async def get_controller_entities(
     controller_id: UUID,
     domain: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
 ):
-    """Get all entities from a controller, optionally filtered by domain."""
-    async with get_pool().acquire() as conn:
-        # Verify ownership and get controller details
-        row = await conn.fetchrow(
-            """
-            SELECT url, access_token_encrypted, connection_status
-            FROM master_controllers
-            WHERE id = $1 AND user_id = $2
-            """,
-            controller_id,
-            current_user["id"],
-        )
+    """
+    Get all entities from a controller, optionally filtered by domain.
+
+    Responses carry an ETag; a matching If-None-Match returns 304 with no body.
+    """
+    conn = await db.acquire()
+    # Verify ownership and get controller details
+    row = await conn.fetchrow(
+        """
+        SELECT url, access_token_encrypted, connection_status
+        FROM master_controllers
+        WHERE id = $1 AND user_id = $2
+        """,
+        controller_id,
+        current_user["id"],
+    )
 
     if not row:
         raise HTTPException(
@@ -262,42 +402,137 @@ async def get_controller_entities(
             detail="Controller not found",
         )
 
-    # Decrypt the access token
-    access_token = decrypt_token(row["access_token_encrypted"])
+    # The listing may call Home Assistant; release the connection first
+    await db.release()
 
-    # Create HA client and fetch states
-    ha_client = HomeAssistantClient(row["url"], access_token)
-    states = await ha_client.get_states()
+    listing = await get_entity_listing(
+        controller_id, row["url"], row["access_token_encrypted"], domain
+    )
 
-    if states is None:
+    if listing is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Failed to fetch entities from Home Assistant",
         )
 
-    # Process and format entities
-    entities = []
-    for state in states:
-        # Extract domain from entity_id (e.g., "light.living_room" -> "light")
-        entity_domain = state["entity_id"].split(".")[0] if "." in state["entity_id"] else "unknown"
-
-        # Filter by domain if specified
-        if domain and entity_domain != domain:
-            continue
-
-        # Extract friendly name from attributes
-        friendly_name = state.get("attributes", {}).get("friendly_name")
-
-        entities.append(
-            EntityState(
-                entity_id=state["entity_id"],
-                state=state["state"],
-                last_changed=state["last_changed"],
-                last_updated=state["last_updated"],
-                friendly_name=friendly_name,
-                domain=entity_domain,
-                attributes=state.get("attributes", {}),
-            )
+    body, etag = listing
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/{controller_id}/readings", response_model=ReadingsResponse)
+async def get_controller_readings(
+    controller_id: UUID,
+    entity_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = Query("1h", description="raw, or a bucket like 1m, 5m, 15m, 1h, 1d"),
+    aggregation: str = Query("avg", pattern="^(avg|min|max|sum|count)$"),
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
+):
+    """
+    Get time-series readings for one entity of a controller.
+
+    Bucketed resolutions are served from the coarsest continuous aggregate
+    whose bucket divides the requested resolution, so long ranges read
+    pre-aggregated rows instead of raw readings.
+    """
+    start, end = default_range(start, end)
+
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end",
         )
 
-    return entities
+    try:
+        points = count_points(start, end, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if points is not None and points > settings.readings_max_points:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range would return {points} points; use a coarser resolution",
+        )
+
+    conn = await db.acquire()
+    # Verify ownership
+    existing = await conn.fetchrow(
+        "SELECT id FROM master_controllers WHERE id = $1 AND user_id = $2",
+        controller_id,
+        current_user["id"],
+    )
+
+    if not existing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Controller not found",
+        )
+
+    rows, source = await fetch_readings(
+        conn, controller_id, entity_id, start, end, resolution, aggregation
+    )
+
+    return ReadingsResponse(
+        entity_id=entity_id,
+        start=start,
+        end=end,
+        resolution=resolution,
+        aggregation=aggregation,
+        source=source,
+        points=rows,
+    )
+
+
+@router.get("/{controller_id}/heartbeats", response_model=HeartbeatHistoryResponse)
+async def get_controller_heartbeats(
+    controller_id: UUID,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = Query("1h", pattern="^(1h|1d)$"),
+    current_user: dict = Depends(get_current_user),
+    db: RequestConnection = Depends(get_db),
+):
+    """Get hourly or daily uptime and probe latency for one controller."""
+    start, end = default_range(start, end)
+
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end",
+        )
+
+    conn = await db.acquire()
+    # Verify ownership
+    existing = await conn.fetchrow(
+        "SELECT id FROM master_controllers WHERE id = $1 AND user_id = $2",
+        controller_id,
+        current_user["id"],
+    )
+
+    if not existing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Controller not found",
+        )
+
+    rows = await fetch_history_rows(conn, [controller_id], start, end, resolution)
+
+    summary = HistoryTotals()
+    for row in rows:
+        summary.add(row)
+
+    return HeartbeatHistoryResponse(
+        controller_id=str(controller_id),
+        start=start,
+        end=end,
+        resolution=resolution,
+        summary=summary.to_dict(),
+        points=history_points(rows),
+    )
@@ -95,3 +95,48 @@ class EntityState(BaseModel):
     friendly_name: Optional[str] = None
     domain: str
     attributes: dict
+
+
+# Time-series schemas
+class ReadingPoint(BaseModel):
+    time: datetime
+    value: Optional[float] = None
+    state: Optional[str] = None
+
+
+class ReadingsResponse(BaseModel):
+    entity_id: str
+    start: datetime
+    end: datetime
+    resolution: str
+    aggregation: str
+    source: str
+    points: list[ReadingPoint]
+
+
+class HeartbeatStats(BaseModel):
+    probes: int
+    uptime: Optional[float] = None
+    avg_ms: Optional[float] = None
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    max_ms: Optional[float] = None
+
+
+class HeartbeatPoint(HeartbeatStats):
+    time: datetime
+
+
+class HeartbeatHistoryResponse(BaseModel):
+    controller_id: str
+    start: datetime
+    end: datetime
+    resolution: str
+    summary: HeartbeatStats
+    points: list[HeartbeatPoint]
+
+
+class ControllerHeartbeatSummary(HeartbeatStats):
+    controller_id: str
+    name: str
+    connection_status: str
@@ -0,0 +1,77 @@
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+
+from apps.realtime import get_hub, make_envelope
+from core.deps import get_user_from_token
+
+router = APIRouter(tags=["realtime"])
+
+AUTH_TIMEOUT = 10
+
+
+@router.websocket("/ws/connect")
+async def websocket_connect(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    Real-time event stream.
+
+    The access token is passed as ?token=... or, if omitted, in a first
+    {"type": "auth", "token": ...} message. Clients then send
+    {"type": "subscribe" | "unsubscribe", "channels": [...]} for their own
+    user:{id}:* channels and receive events in the standard envelope.
+    """
+    await websocket.accept()
+
+    try:
+        if token is None:
+            message = await asyncio.wait_for(websocket.receive_json(), timeout=AUTH_TIMEOUT)
+            token = message.get("token") if message.get("type") == "auth" else None
+        user = await get_user_from_token(token or "")
+    except (HTTPException, asyncio.TimeoutError, ValueError, WebSocketDisconnect):
+        await websocket.close(code=4401)
+        return
+
+    hub = get_hub()
+    connection = await hub.connect(websocket, user["id"])
+    connection.enqueue(make_envelope("system.connected", {"user_id": str(user["id"])}))
+
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                connection.enqueue(make_envelope("system.error", {"message": "Invalid JSON"}))
+                continue
+
+            message_type = message.get("type")
+            channels = message.get("channels") or []
+
+            if message_type == "subscribe":
+                accepted = []
+                for channel in channels:
+                    if hub.can_subscribe(connection, channel):
+                        await hub.subscribe(connection, channel)
+                        accepted.append(channel)
+                rejected = [channel for channel in channels if channel not in accepted]
+                connection.enqueue(
+                    make_envelope(
+                        "system.subscribed", {"channels": accepted, "rejected": rejected}
+                    )
+                )
+            elif message_type == "unsubscribe":
+                for channel in channels:
+                    await hub.unsubscribe(connection, channel)
+                connection.enqueue(make_envelope("system.unsubscribed", {"channels": channels}))
+            elif message_type == "ping":
+                connection.enqueue(make_envelope("system.pong", {}))
+            else:
+                connection.enqueue(
+                    make_envelope("system.error", {"message": f"Unknown type '{message_type}'"})
+                )
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the hub already closed this socket (slow consumer)
+        pass
+    finally:
+        await hub.disconnect(connection)
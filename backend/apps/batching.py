@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+
+class BatchWriter:
+    """
+    Bounded queue drained in batches by a background task.
+
+    A batch is flushed when `batch_size` items are buffered or
+    `flush_interval` seconds have passed since its first item, whichever is
+    first. Subclasses decide what happens when the queue is full and
+    implement _flush(); _after_flush() runs after every batch.
+    """
+
+    def __init__(self, queue_size: int, batch_size: int, flush_interval: float):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: asyncio.Task = None
+        self.running = False
+        self._batch: list = []
+
+    async def start(self):
+        """Start the background writer task."""
+        if self.running:
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._writer_loop())
+
+    async def stop(self):
+        """Stop the writer and flush whatever is still queued."""
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+        # Flush the batch that was being filled, then drain the queue
+        pending, self._batch = self._batch, []
+        await self._flush(pending)
+        while not self.queue.empty():
+            await self._flush(self._take(self.batch_size))
+
+    def _take(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _writer_loop(self):
+        while self.running:
+            # Wait for the first item of the next batch
+            batch = self._batch
+            batch.append(await self.queue.get())
+            deadline = time.monotonic() + self.flush_interval
+
+            # Fill until the batch is full or its time window closes
+            while len(batch) < self.batch_size:
+                batch.extend(self._take(self.batch_size - len(batch)))
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+            self._batch = []
+            await self._after_flush()
+
+    async def _flush(self, batch: list):
+        raise NotImplementedError
+
+    async def _after_flush(self):
+        pass
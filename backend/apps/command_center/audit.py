@@ -0,0 +1,440 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+from uuid import UUID
+
+import asyncpg
+from fastapi import Request
+
+from apps.batching import BatchWriter
+from core.config import settings
+from core.pagination import decode_cursor
+from db.postgres import get_pool
+
+logger = logging.getLogger(__name__)
+
+AUDIT_COLUMNS = """
+    al.id, al.user_id, u.email as user_email,
+    al.action, al.resource_type, al.resource_id,
+    al.details, al.ip_address, al.created_at
+"""
+
+AUDIT_EXPORT_FIELDS = [
+    "id", "user_id", "user_email", "action", "resource_type", "resource_id",
+    "details", "ip_address", "created_at",
+]
+
+
+class AuditFilters:
+    """
+    WHERE clause builder for cc_audit_logs queries.
+
+    Shared by the list and export routes so both accept the same filters.
+    Every filter is an equality on a leading index column or a range on
+    created_at, matching the (action | user_id, created_at, id) indexes.
+    """
+
+    def __init__(
+        self,
+        action: Optional[str] = None,
+        user_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ):
+        self.conditions: list[str] = []
+        self.params: list = []
+
+        if action:
+            self.add("al.action = ${}", action)
+        if user_id:
+            self.add("al.user_id = ${}::uuid", user_id)
+        if start:
+            self.add("al.created_at >= ${}", start)
+        if end:
+            self.add("al.created_at < ${}", end)
+
+    def add(self, condition: str, *values):
+        """Add a condition whose ${} placeholders are numbered in order."""
+        for value in values:
+            self.params.append(value)
+            condition = condition.replace("${}", f"${len(self.params)}", 1)
+        self.conditions.append(condition)
+
+    def after_cursor(self, cursor: str):
+        """
+        Only rows after a keyset cursor, in (created_at, id) DESC order.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        created_at, row_id = decode_cursor(cursor)
+        self.add("(al.created_at, al.id) < (${}, ${})", created_at, row_id)
+        # Redundant with the row comparison, but lets the planner exclude chunks
+        self.add("al.created_at <= ${}", created_at)
+
+    def where(self) -> str:
+        if not self.conditions:
+            return ""
+        return "WHERE " + " AND ".join(self.conditions)
+
+    def next_param(self) -> int:
+        """Number of the next positional parameter."""
+        return len(self.params) + 1
+
+
+AUDIT_WRITE_COLUMNS = [
+    "user_id", "action", "resource_type", "resource_id",
+    "details", "ip_address", "user_agent", "created_at",
+]
+
+
+class AuditSink(BatchWriter):
+    """
+    Buffers audit events in memory and writes them to cc_audit_logs with COPY.
+
+    record() never waits on the database: events go into a bounded queue and
+    a background task flushes them when `batch_size` are buffered or
+    `flush_interval` seconds have passed, whichever is first. Batches that
+    cannot be written (Postgres down, or the queue overflowing) are appended
+    to an NDJSON spill file under `spill_dir` and replayed after the next
+    successful flush, so events survive an outage and a restart.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = None,
+        batch_size: int = None,
+        flush_interval: float = None,
+        spill_dir: str = None,
+    ):
+        super().__init__(
+            queue_size or settings.audit_queue_size,
+            batch_size or settings.audit_batch_size,
+            flush_interval or settings.audit_flush_interval,
+        )
+        self.spill_dir = Path(spill_dir or settings.audit_spill_dir)
+        self.spill_file = self.spill_dir / f"audit-{os.getpid()}-{uuid.uuid4().hex[:8]}.ndjson"
+        self._overflow: list[tuple] = []
+        self.spill_pending = False
+
+        self.recorded = 0
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.quarantined = 0
+        self.batches = 0
+
+    def record(
+        self,
+        action: str,
+        user_id=None,
+        resource_type: Optional[str] = None,
+        resource_id=None,
+        details: Optional[dict] = None,
+        request: Optional[Request] = None,
+    ):
+        """Queue one audit event. Cheap enough to call from any handler."""
+        event = (
+            UUID(str(user_id)) if user_id else None,
+            action,
+            resource_type,
+            str(resource_id) if resource_id is not None else None,
+            json.dumps(details, default=str) if details is not None else None,
+            request.client.host if request and request.client else None,
+            request.headers.get("user-agent") if request else None,
+            datetime.now(timezone.utc),
+        )
+        self.recorded += 1
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Never drop audit events: hold them for the spill file instead
+            self._overflow.append(event)
+
+    async def start(self):
+        """Start the background writer task, picking up spill files left by earlier runs."""
+        if self.running:
+            return
+
+        reclaimed = await asyncio.to_thread(self._reclaim_stale_spills)
+        if reclaimed:
+            logger.warning(f"Picked up {reclaimed} audit spill files from an interrupted replay")
+        self.spill_pending = await asyncio.to_thread(self._has_spill_files)
+        await super().start()
+        logger.info("Audit sink started")
+
+    async def stop(self):
+        """Stop the writer and flush everything still buffered."""
+        await super().stop()
+        await self._spill_overflow()
+        logger.info("Audit sink stopped")
+
+    async def _after_flush(self):
+        await self._spill_overflow()
+        if self.spill_pending:
+            await self._replay_spill()
+
+    async def _copy(self, conn, batch: list[tuple]):
+        """
+        COPY events into cc_audit_logs.
+
+        An event whose user has been deleted since it was recorded fails the
+        whole COPY on the user_id foreign key. When that happens those events
+        are kept with user_id cleared, as ON DELETE SET NULL would have left
+        them, and the COPY is retried once. The first attempt runs in its own
+        (sub)transaction so the retry works inside a caller's transaction.
+        """
+        try:
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    "cc_audit_logs", records=batch, columns=AUDIT_WRITE_COLUMNS
+                )
+            return
+        except asyncpg.ForeignKeyViolationError:
+            pass
+
+        rows = await conn.fetch(
+            "SELECT id FROM users WHERE id = ANY($1::uuid[])",
+            list({event[0] for event in batch if event[0] is not None}),
+        )
+        known = {str(row["id"]) for row in rows}
+        unlinked = sum(1 for event in batch if event[0] is not None and str(event[0]) not in known)
+        logger.warning(f"Clearing user_id on {unlinked} audit events for deleted users")
+        batch = [
+            event if event[0] is None or str(event[0]) in known else (None, *event[1:])
+            for event in batch
+        ]
+        await conn.copy_records_to_table(
+            "cc_audit_logs", records=batch, columns=AUDIT_WRITE_COLUMNS
+        )
+
+    async def _flush(self, batch: list[tuple]):
+        if not batch:
+            return
+
+        try:
+            async with get_pool().acquire() as conn:
+                await self._copy(conn, batch)
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} audit events, spilling to disk: {e}")
+            await self._spill(batch)
+            return
+
+        self.written += len(batch)
+        self.batches += 1
+
+    async def _spill_overflow(self):
+        if self._overflow:
+            overflow, self._overflow = self._overflow, []
+            await self._spill(overflow)
+
+    async def _spill(self, batch: list[tuple]):
+        try:
+            await asyncio.to_thread(self._append_spill, batch)
+        except Exception as e:
+            logger.error(f"Error spilling {len(batch)} audit events, they are lost: {e}")
+            return
+        self.spilled += len(batch)
+        self.spill_pending = True
+
+    def _append_spill(self, batch: list[tuple]):
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        with self.spill_file.open("a") as f:
+            for event in batch:
+                f.write(json.dumps(dict(zip(AUDIT_WRITE_COLUMNS, event)), default=str) + "\n")
+
+    def _has_spill_files(self) -> bool:
+        return self.spill_dir.is_dir() and any(self.spill_dir.glob("audit-*.ndjson"))
+
+    def _reclaim_stale_spills(self) -> int:
+        """
+        Put back spill files whose replay was interrupted.
+
+        A claimed file is stale if the worker that claimed it is gone, or
+        carries our own pid (left by an earlier process that had it).
+        """
+        if not self.spill_dir.is_dir():
+            return 0
+
+        reclaimed = 0
+        for path in self.spill_dir.glob("audit-*.replaying-*"):
+            try:
+                pid = int(path.suffix.rsplit("-", 1)[1])
+            except ValueError:
+                continue
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            try:
+                path.rename(path.with_suffix(".ndjson"))
+            except OSError:
+                continue
+            reclaimed += 1
+        return reclaimed
+
+    async def _replay_spill(self):
+        """
+        Write spilled events back to Postgres, one spill file at a time.
+
+        Each file is copied in a single transaction, so a failure part way
+        through never leaves some of its events written. Files Postgres
+        rejects outright (a constraint violation or bad data) would fail
+        the same way forever; they are renamed to *.failed and skipped.
+        """
+        self.spill_pending = False
+        for path in await asyncio.to_thread(lambda: sorted(self.spill_dir.glob("audit-*.ndjson"))):
+            # Renaming claims the file, so two workers never replay the same one
+            claimed = path.with_suffix(f".replaying-{os.getpid()}")
+            try:
+                await asyncio.to_thread(path.rename, claimed)
+            except OSError:
+                continue
+
+            try:
+                events = await asyncio.to_thread(_read_spill, claimed)
+                async with get_pool().acquire() as conn:
+                    async with conn.transaction():
+                        await self._copy(conn, events)
+            except (
+                asyncpg.IntegrityConstraintViolationError,
+                asyncpg.DataError,
+                ValueError,
+                KeyError,
+            ) as e:
+                failed = path.with_suffix(".failed")
+                logger.error(
+                    f"Audit spill {path.name} cannot be replayed, kept as {failed.name}: {e}"
+                )
+                await asyncio.to_thread(claimed.rename, failed)
+                self.quarantined += 1
+                continue
+            except asyncio.CancelledError:
+                # stop() cancelled us and the transaction rolled back: hand the file back
+                claimed.rename(path)
+                raise
+            except Exception as e:
+                logger.error(f"Error replaying audit spill {path.name}: {e}")
+                await asyncio.to_thread(claimed.rename, path)
+                self.spill_pending = True
+                return
+
+            await asyncio.to_thread(claimed.unlink)
+            self.replayed += len(events)
+            logger.info(f"Replayed {len(events)} spilled audit events from {path.name}")
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue_size,
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "quarantined": self.quarantined,
+            "spill_pending": self.spill_pending,
+        }
+
+
+def _read_spill(path: Path) -> list[tuple]:
+    events = []
+    with path.open() as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            events.append(
+                (
+                    UUID(data["user_id"]) if data["user_id"] else None,
+                    data["action"],
+                    data["resource_type"],
+                    data["resource_id"],
+                    data["details"],
+                    data["ip_address"],
+                    data["user_agent"],
+                    datetime.fromisoformat(data["created_at"]),
+                )
+            )
+    return events
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# (job proc_name, config key, add function, remove function)
+AUDIT_POLICIES = {
+    "compression": (
+        "policy_compression", "compress_after",
+        "add_compression_policy", "remove_compression_policy",
+    ),
+    "retention": (
+        "policy_retention", "drop_after",
+        "add_retention_policy", "remove_retention_policy",
+    ),
+}
+
+
+async def reconcile_audit_policies():
+    """
+    Bring the cc_audit_logs chunk interval and policies in line with settings.
+
+    Policies are only replaced when their interval differs, under an advisory
+    lock so workers starting together don't race each other.
+    """
+    desired = {
+        "compression": settings.audit_compress_after_days,
+        "retention": settings.audit_retention_days,
+    }
+
+    async with get_pool().acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('cc_audit_logs_policies'))")
+            await conn.execute(
+                "SELECT set_chunk_time_interval('cc_audit_logs', $1::interval)",
+                timedelta(days=settings.audit_chunk_interval_days),
+            )
+
+            for name, days in desired.items():
+                proc_name, config_key, add_fn, remove_fn = AUDIT_POLICIES[name]
+                current = await conn.fetchval(
+                    """
+                    SELECT (config->>$2)::interval
+                    FROM timescaledb_information.jobs
+                    WHERE hypertable_name = 'cc_audit_logs' AND proc_name = $1
+                    """,
+                    proc_name,
+                    config_key,
+                )
+                target = timedelta(days=days) if days > 0 else None
+                if current == target:
+                    continue
+
+                await conn.execute(f"SELECT {remove_fn}('cc_audit_logs', if_exists => true)")
+                if target is not None:
+                    await conn.execute(f"SELECT {add_fn}('cc_audit_logs', $1::interval)", target)
+                logger.info(f"Audit log {name} policy set to {days or 'off'} days")
+
+
+# Global audit sink instance
+_audit_sink: AuditSink = None
+
+
+def get_audit_sink() -> AuditSink:
+    """Get the global audit sink instance."""
+    global _audit_sink
+    if _audit_sink is None:
+        _audit_sink = AuditSink()
+    return _audit_sink
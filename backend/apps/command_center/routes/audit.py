@@ -1,8 +1,18 @@
-from typing import Optional
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 
+from apps.command_center.audit import AUDIT_COLUMNS, AUDIT_EXPORT_FIELDS, AuditFilters
 from apps.framework.permissions import require_app_access
+from core.config import settings
+from core.deps import RequestConnection, get_db
+from core.pagination import NEXT_CURSOR_HEADER, encode_cursor
 from db.postgres import get_pool
 
 router = APIRouter(prefix="/audit", tags=["audit"])
@@ -10,40 +20,137 @@ router = APIRouter(prefix="/audit", tags=["audit"])
 
 @router.get("")
 async def list_audit_logs(
-    limit: int = Query(50, le=200),
-    offset: int = Query(0),
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     action: Optional[str] = None,
     user_id: Optional[str] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
     current_user: dict = Depends(require_app_access("command_center")),
+    db: RequestConnection = Depends(get_db),
 ):
-    """List audit log entries."""
-    query = """
-        SELECT al.id, al.user_id, u.email as user_email,
-               al.action, al.resource_type, al.resource_id,
-               al.details, al.ip_address, al.created_at
+    """
+    List audit log entries, newest first.
+
+    Pass the X-Next-Cursor header of one page as `cursor` to get the next:
+    keyset pagination on (created_at, id) costs the same at any depth.
+    `offset` is still accepted for older clients but ignored with a cursor.
+    """
+    filters = AuditFilters(action, user_id, start, end)
+
+    if cursor:
+        try:
+            filters.after_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        offset = 0
+
+    param_idx = filters.next_param()
+    query = f"""
+        SELECT {AUDIT_COLUMNS}
         FROM cc_audit_logs al
         LEFT JOIN users u ON al.user_id = u.id
-        WHERE 1=1
+        {filters.where()}
+        ORDER BY al.created_at DESC, al.id DESC
+        LIMIT ${param_idx} OFFSET ${param_idx + 1}
+    """
+
+    # One extra row tells us whether there is a next page
+    conn = await db.acquire()
+    rows = await conn.fetch(query, *filters.params, limit + 1, offset)
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last["created_at"], last["id"])
+
+    return [dict(row) for row in rows]
+
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+@router.get("/export")
+async def export_audit_logs(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    action: Optional[str] = None,
+    user_id: Optional[UUID] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    current_user: dict = Depends(require_app_access("command_center")),
+    db: RequestConnection = Depends(get_db),
+):
     """
-    params = []
-    param_idx = 1
+    Stream every matching audit log entry, oldest first, as CSV or NDJSON.
 
-    if action:
-        query += f" AND al.action = ${param_idx}"
-        params.append(action)
-        param_idx += 1
+    Rows are read through a server-side cursor and written out in chunks,
+    so memory use stays flat however many rows match. Takes the same
+    filters as the list endpoint.
 
-    if user_id:
-        query += f" AND al.user_id = ${param_idx}::uuid"
-        params.append(user_id)
-        param_idx += 1
+    Filters are validated before the first byte is sent, since errors can no
+    longer change the status code once streaming starts.
+    """
+    # The stream uses its own connection for as long as it runs
+    await db.release()
+
+    filters = AuditFilters(action, user_id, start, end)
+    query = f"""
+        SELECT {AUDIT_COLUMNS}
+        FROM cc_audit_logs al
+        LEFT JOIN users u ON al.user_id = u.id
+        {filters.where()}
+        ORDER BY al.created_at, al.id
+    """
 
-    query += (
-        f" ORDER BY al.created_at DESC LIMIT ${param_idx} OFFSET ${param_idx + 1}"
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return StreamingResponse(
+        _stream_audit_rows(query, filters.params, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="audit-{stamp}.{format}"'},
     )
-    params.extend([limit, offset])
+
+
+async def _stream_audit_rows(query: str, params: list, format: str) -> AsyncIterator[str]:
+    chunk_rows = settings.audit_export_chunk_rows
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == "csv":
+        writer.writerow(AUDIT_EXPORT_FIELDS)
 
     async with get_pool().acquire() as conn:
-        rows = await conn.fetch(query, *params)
+        # Server-side cursors only live inside a transaction
+        async with conn.transaction(readonly=True):
+            pending = 0
+            async for row in conn.cursor(query, *params, prefetch=chunk_rows):
+                if format == "csv":
+                    writer.writerow(_csv_value(row[field]) for field in AUDIT_EXPORT_FIELDS)
+                else:
+                    record = dict(row)
+                    # asyncpg returns jsonb as text; nest it as an object, not a string
+                    if record["details"] is not None:
+                        record["details"] = json.loads(record["details"])
+                    buffer.write(json.dumps(record, default=str))
+                    buffer.write("\n")
 
-    return [dict(row) for row in rows]
+                pending += 1
+                if pending >= chunk_rows:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
@@ -1,23 +1,40 @@
-from fastapi import APIRouter, Depends
+import json
+import logging
+from datetime import datetime, timezone
 
-from apps.framework.permissions import require_app_access
+from fastapi import APIRouter, Depends, Query
+
+from apps.command_center.audit import get_audit_sink
+from apps.connection_manager import get_connection_manager
+from apps.framework.permissions import permission_cache, require_app_access
 from apps.framework.registry import get_registry
-from db.postgres import get_pool
+from apps.ha_client import get_client_pool
+from apps.ha_gateway import get_gateway
+from apps.realtime import get_hub, get_publisher
+from apps.resolver import get_resolver
+from apps.singleflight import get_single_flight
+from apps.telemetry import get_ingestor
+from core.config import settings
+from core.deps import RequestConnection, get_db, user_cache
+from core.encryption import token_cache
 from db.redis import get_redis
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/system", tags=["system"])
 
 
 @router.get("/health")
 async def system_health(
     current_user: dict = Depends(require_app_access("command_center")),
+    db: RequestConnection = Depends(get_db),
 ):
     """Get system health status."""
     health = {"database": "unknown", "redis": "unknown", "apps": []}
 
     try:
-        async with get_pool().acquire() as conn:
-            await conn.fetchval("SELECT 1")
+        conn = await db.acquire()
+        await conn.fetchval("SELECT 1")
         health["database"] = "healthy"
     except Exception as e:
         health["database"] = f"error: {str(e)}"
@@ -38,25 +55,128 @@ async def system_health(
     return health
 
 
+STATS_CACHE_KEY = "system:stats:{mode}"
+
+USER_COUNT_EXACT = "(SELECT count(*) FROM users)"
+# Planner estimate; falls back to an exact count if the table was never analyzed
+USER_COUNT_APPROXIMATE = """COALESCE(
+    (SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass AND reltuples >= 0),
+    (SELECT count(*) FROM users)
+)"""
+
+
 @router.get("/stats")
 async def system_stats(
+    approximate: bool = Query(False, description="Estimate the user count from table statistics"),
     current_user: dict = Depends(require_app_access("command_center")),
+    db: RequestConnection = Depends(get_db),
 ):
-    """Get system statistics."""
-    async with get_pool().acquire() as conn:
-        user_count = await conn.fetchval("SELECT COUNT(*) FROM users")
-        controller_count = await conn.fetchval(
-            "SELECT COUNT(*) FROM master_controllers"
-        )
-        online_controllers = await conn.fetchval(
-            "SELECT COUNT(*) FROM master_controllers WHERE connection_status = 'online'"
-        )
+    """
+    Get system statistics.
 
-    return {
-        "users": {"total": user_count},
+    Counts come from one scan of master_controllers and are cached in Redis
+    for `system_stats_cache_ttl` seconds, so a polling dashboard doesn't
+    rescan on every request.
+    """
+    cache_key = STATS_CACHE_KEY.format(mode="approximate" if approximate else "exact")
+    redis = get_redis()
+
+    try:
+        cached = await redis.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+    except Exception as e:
+        logger.error(f"Error reading system stats cache: {e}")
+
+    users_expression = USER_COUNT_APPROXIMATE if approximate else USER_COUNT_EXACT
+    conn = await db.acquire()
+    row = await conn.fetchrow(
+        f"""
+        SELECT {users_expression} AS users,
+               count(*) AS total,
+               count(*) FILTER (WHERE connection_status = 'online') AS online,
+               count(*) FILTER (WHERE connection_status = 'offline') AS offline,
+               count(*) FILTER (WHERE connection_status = 'connecting') AS connecting,
+               count(*) FILTER (WHERE connection_status = 'error') AS error
+        FROM master_controllers
+        """
+    )
+
+    stats = {
+        "users": {"total": row["users"], "approximate": approximate},
         "controllers": {
-            "total": controller_count,
-            "online": online_controllers,
-            "offline": controller_count - online_controllers,
+            "total": row["total"],
+            "online": row["online"],
+            # Everything not online, as before; by_status has the breakdown
+            "offline": row["total"] - row["online"],
+            "by_status": {
+                status: row[status] for status in ("online", "offline", "connecting", "error")
+            },
         },
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+    try:
+        await redis.set(cache_key, json.dumps(stats), ex=settings.system_stats_cache_ttl)
+    except Exception as e:
+        logger.error(f"Error writing system stats cache: {e}")
+
+    return stats
+
+
+@router.get("/heartbeat")
+async def heartbeat_stats(
+    current_user: dict = Depends(require_app_access("command_center")),
+):
+    """Get timing of the last batch of heartbeat results and the polling schedule."""
+    manager = get_connection_manager()
+    sweep = manager.last_sweep
+
+    return {
+        "running": manager.running,
+        "interval": manager.interval,
+        "concurrency": manager.concurrency,
+        "last_sweep": sweep.to_dict() if sweep else None,
+        "leases": manager.leases.stats(),
+        "schedule": manager.schedule_stats(),
+        "http_pool": get_client_pool().stats(),
+        "dns": get_resolver().stats(),
+        "gateway": get_gateway().stats(),
+        "singleflight": get_single_flight().stats(),
+    }
+
+
+@router.get("/telemetry")
+async def telemetry_stats(
+    current_user: dict = Depends(require_app_access("command_center")),
+):
+    """Get telemetry ingestion throughput and backpressure counters."""
+    return get_ingestor().stats()
+
+
+@router.get("/realtime")
+async def realtime_stats(
+    current_user: dict = Depends(require_app_access("command_center")),
+):
+    """Get WebSocket fan-out counters for this worker."""
+    return {**get_hub().stats(), "publish_dropped": get_publisher().dropped}
+
+
+@router.get("/audit-sink")
+async def audit_sink_stats(
+    current_user: dict = Depends(require_app_access("command_center")),
+):
+    """Get audit log writer throughput and spill counters."""
+    return get_audit_sink().stats()
+
+
+@router.get("/caches")
+async def cache_stats(
+    current_user: dict = Depends(require_app_access("command_center")),
+):
+    """Get hit/miss counters for this worker's in-process caches."""
+    return {
+        "users": user_cache.stats(),
+        "permissions": permission_cache.stats(),
+        "tokens": token_cache.stats(),
     }
@@ -1,63 +1,139 @@
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 
-from apps.framework.permissions import require_app_access
-from db.postgres import get_pool
+from apps.command_center.audit import get_audit_sink
+from apps.framework.permissions import invalidate_permissions, require_app_access
+from core.deps import RequestConnection, get_db
+from core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.get("")
 async def list_users(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    q: Optional[str] = Query(None, description="Case-insensitive email prefix"),
+    include_controller_count: bool = False,
     current_user: dict = Depends(require_app_access("command_center")),
+    db: RequestConnection = Depends(get_db),
 ):
-    """List all users."""
-    async with get_pool().acquire() as conn:
-        rows = await conn.fetch(
-            "SELECT id, email, created_at, updated_at FROM users ORDER BY created_at DESC"
-        )
+    """
+    List users, newest first.
+
+    Pages are keyed on (created_at, id): pass the X-Next-Cursor header of
+    one page as `cursor` to get the next. `q` filters by email prefix using
+    the lower(email) text_pattern_ops index.
+    """
+    conditions = []
+    params = []
+
+    if q:
+        params.append(_escape_like(q.lower()) + "%")
+        conditions.append(f"lower(u.email) LIKE ${len(params)}")
+
+    if cursor:
+        try:
+            created_at, row_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        params.extend([created_at, row_id])
+        conditions.append(f"(u.created_at, u.id) < (${len(params) - 1}, ${len(params)})")
+
+    columns = "u.id, u.email, u.created_at, u.updated_at"
+    join = ""
+    if include_controller_count:
+        columns += ", c.controller_count"
+        join = """
+        LEFT JOIN LATERAL (
+            SELECT count(*) AS controller_count
+            FROM master_controllers mc
+            WHERE mc.user_id = u.id
+        ) c ON true
+        """
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    params.append(limit + 1)
+    query = f"""
+        SELECT {columns}
+        FROM users u
+        {join}
+        {where}
+        ORDER BY u.created_at DESC, u.id DESC
+        LIMIT ${len(params)}
+    """
+
+    # One extra row tells us whether there is a next page
+    conn = await db.acquire()
+    rows = await conn.fetch(query, *params)
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last["created_at"], last["id"])
+
     return [dict(row) for row in rows]
 
 
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 @router.get("/{user_id}/app-permissions")
 async def get_user_app_permissions(
     user_id: UUID,
     current_user: dict = Depends(require_app_access("command_center")),
+    db: RequestConnection = Depends(get_db),
 ):
     """Get app permissions for a specific user."""
-    async with get_pool().acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT app_id, has_access, granted_at, granted_by
-            FROM user_app_permissions
-            WHERE user_id = $1
-            """,
-            user_id,
-        )
+    conn = await db.acquire()
+    rows = await conn.fetch(
+        """
+        SELECT app_id, has_access, granted_at, granted_by
+        FROM user_app_permissions
+        WHERE user_id = $1
+        """,
+        user_id,
+    )
     return [dict(row) for row in rows]
 
 
 @router.put("/{user_id}/app-permissions/{app_id}")
 async def set_user_app_permission(
+    request: Request,
     user_id: UUID,
     app_id: str,
     has_access: bool,
     current_user: dict = Depends(require_app_access("command_center")),
+    db: RequestConnection = Depends(get_db),
 ):
     """Set app permission for a user."""
-    async with get_pool().acquire() as conn:
-        await conn.execute(
-            """
-            INSERT INTO user_app_permissions (user_id, app_id, has_access, granted_by)
-            VALUES ($1, $2, $3, $4)
-            ON CONFLICT (user_id, app_id)
-            DO UPDATE SET has_access = $3, granted_by = $4, granted_at = NOW()
-            """,
-            user_id,
-            app_id,
-            has_access,
-            current_user["id"],
-        )
+    conn = await db.acquire()
+    await conn.execute(
+        """
+        INSERT INTO user_app_permissions (user_id, app_id, has_access, granted_by)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (user_id, app_id)
+        DO UPDATE SET has_access = $3, granted_by = $4, granted_at = NOW()
+        """,
+        user_id,
+        app_id,
+        has_access,
+        current_user["id"],
+    )
+
+    await invalidate_permissions(user_id)
+
+    get_audit_sink().record(
+        "permission.update",
+        current_user["id"],
+        "user",
+        user_id,
+        {"app_id": app_id, "has_access": has_access},
+        request,
+    )
+
     return {"message": "Permission updated"}
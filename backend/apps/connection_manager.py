@@ -1,28 +1,157 @@
 import asyncio
+import heapq
 import logging
-from datetime import datetime
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
 
 from apps.ha_client import HomeAssistantClient
+from apps.ha_gateway import get_gateway
+from apps.heartbeat_history import HISTORY_COLUMNS
+from apps.leases import get_worker_leases
+from apps.realtime import make_envelope, user_channel
+from apps.telemetry import copy_controller_rows
+from core.config import settings
 from core.encryption import decrypt_token
+from core.invalidation import get_invalidation_bus
 from db.postgres import get_pool
 from db.redis import get_redis
 
 logger = logging.getLogger(__name__)
 
+TIMEOUT_ERROR = "Connection timeout"
+
+# How soon to retry controllers whose sweep could not read them from Postgres
+FETCH_RETRY_DELAY = 5.0
+
+
+@dataclass
+class HeartbeatResult:
+    """Outcome of checking one controller, written back at the end of a sweep."""
+
+    controller_id: str
+    status: str
+    error: str | None = None
+    version: str | None = None
+    rtt_ms: float | None = None
+    checked_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+@dataclass
+class SweepStats:
+    """
+    Timing and outcome counters for one batch of heartbeat results.
+
+    Checks run independently; results that complete within
+    `heartbeat_result_flush_window` of each other are written back, and
+    counted here, together. `duration` runs from the start of the batch's
+    earliest check to its write.
+    """
+
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    duration: float = 0.0
+    fleet: int = 0  # Controllers across all workers
+    controllers: int = 0  # Controllers with a result in this batch
+    checked: int = 0
+    online: int = 0
+    offline: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    written: int = 0
+    interval: int = 0
+
+    def record(self, result: HeartbeatResult):
+        """Count one controller's outcome."""
+        self.checked += 1
+        if result.status == "online":
+            self.online += 1
+        elif result.status == "offline":
+            self.offline += 1
+        else:
+            self.errors += 1
+        if result.error == TIMEOUT_ERROR:
+            self.timeouts += 1
+
+    @property
+    def overran(self) -> bool:
+        """True if the batch took longer than the heartbeat interval."""
+        return self.duration > self.interval
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "overran": self.overran}
+
+
+@dataclass
+class ControllerSchedule:
+    """Polling state for one controller."""
+
+    controller_id: str
+    next_due: float = 0.0
+    status: str | None = None
+    failures: int = 0  # Consecutive offline/error results
+    fast_probes: int = 0  # Quick re-checks left after a status change
+    breaker_open: bool = False
+    version_checked: float = float("-inf")  # When /api/config was last read
+    last_checked: float | None = None
+
 
 class ConnectionManager:
-    """Manages background heartbeat monitoring for Home Assistant controllers."""
+    """
+    Manages background heartbeat monitoring for Home Assistant controllers.
+
+    Every API process runs one, but the fleet is split between them through
+    worker leases: this worker only checks the controllers it owns, so a
+    controller is checked once per interval however many processes run.
 
-    def __init__(self, interval: int = 30):
-        self.interval = interval
+    Each owned controller has its own next-due time, kept in a heap. Healthy
+    controllers are checked every `interval`; a controller whose status just
+    changed is re-checked a few times at the faster flap interval; offline or
+    failing controllers back off exponentially, and after repeated failures
+    the circuit breaker opens and the controller is only probed once per
+    cooldown. Every check runs as its own task under a worker-wide limit of
+    `concurrency`, and finished checks are written back in one batched
+    update per `heartbeat_result_flush_window`.
+    """
+
+    def __init__(
+        self,
+        interval: int = None,
+        concurrency: int = None,
+        jitter: float = None,
+        check_timeout: float = None,
+    ):
+        self.interval = interval or settings.heartbeat_interval
+        self.concurrency = concurrency or settings.heartbeat_concurrency
+        self.jitter = settings.heartbeat_jitter if jitter is None else jitter
+        self.check_timeout = check_timeout or settings.heartbeat_check_timeout
         self.task: asyncio.Task = None
         self.running = False
+        self.last_sweep: SweepStats = None
+        self.leases = get_worker_leases()
+        self.schedules: dict[str, ControllerSchedule] = {}
+        self.fleet = 0
+        self.history_written = 0
+        self.history_failed = 0
+        self._history: list[tuple] = []
+        self._history_flushed = time.monotonic()
+        self._heap: list[tuple[float, str]] = []
+        self._next_reload = 0.0
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._checks: set[asyncio.Task] = set()
+        self._in_flight: set[str] = set()
+        self._recheck: set[str] = set()  # Rescheduled while a check was running
+        self._results: list[tuple[dict, HeartbeatResult, float]] = []
+        self._results_since: float | None = None
 
     async def start(self):
         """Start the background heartbeat task."""
         if self.running:
             return
 
+        await self.leases.start()
         self.running = True
         self.task = asyncio.create_task(self._heartbeat_loop())
         logger.info("Connection manager started")
@@ -36,118 +165,507 @@ class ConnectionManager:
                 await self.task
             except asyncio.CancelledError:
                 pass
+        for check in self._checks:
+            check.cancel()
+        await asyncio.gather(*self._checks, return_exceptions=True)
+        await self._flush_results()
+        await self._flush_history()
+        await self.leases.stop()
         logger.info("Connection manager stopped")
 
+    def reschedule(self, controller_id):
+        """Forget a controller's backoff and check it as soon as possible."""
+        controller_id = str(controller_id)
+        if not self.running or not self.leases.owns(controller_id):
+            return
+        self._schedule(ControllerSchedule(controller_id), time.monotonic())
+        self._wakeup.set()
+
+    def _schedule(self, schedule: ControllerSchedule, due: float):
+        schedule.next_due = due
+        self.schedules[schedule.controller_id] = schedule
+        heapq.heappush(self._heap, (due, schedule.controller_id))
+
     async def _heartbeat_loop(self):
-        """Main heartbeat loop - checks all controllers periodically."""
+        """Main heartbeat loop - starts checks as controllers come due and writes results."""
         while self.running:
+            # Cleared before the work, so a check finishing meanwhile still wakes us
+            self._wakeup.clear()
             try:
-                await self._check_all_controllers()
+                if time.monotonic() >= self._next_reload:
+                    # Advance first so a failing reload waits an interval, not a hot loop
+                    self._next_reload = time.monotonic() + self.interval
+                    await self._reload_fleet()
+                await self._check_due_controllers()
+                if self._results_due():
+                    await self._flush_results()
             except Exception as e:
                 logger.error(f"Error in heartbeat loop: {e}")
 
-            await asyncio.sleep(self.interval)
+            # Sleep until the next controller is due, the next fleet reload,
+            # results are due to be written, or a finished check or
+            # reschedule() wakes us up
+            wake_at = self._next_reload
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+            if self._results_since is not None:
+                wake_at = min(
+                    wake_at, self._results_since + settings.heartbeat_result_flush_window
+                )
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=max(wake_at - time.monotonic(), 0)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _reload_fleet(self):
+        """
+        Sync the schedule with the controllers this worker owns.
 
-    async def _check_all_controllers(self):
-        """Check status of all registered controllers."""
+        Ownership is recomputed from the live worker list; newly owned
+        controllers are spread over the first `jitter` fraction of the
+        interval, and streams for controllers that moved away are closed.
+        """
         async with get_pool().acquire() as conn:
-            controllers = await conn.fetch(
-                """
-                SELECT id, url, access_token_encrypted, connection_status
-                FROM master_controllers
-                """
-            )
+            rows = await conn.fetch("SELECT id FROM master_controllers")
+
+        await self.leases.refresh()
+        self.fleet = len(rows)
+        now = time.monotonic()
+        spread = self.interval * self.jitter
+
+        owned = set()
+        for row in rows:
+            controller_id = str(row["id"])
+            if self.leases.owns(controller_id):
+                owned.add(controller_id)
+                if controller_id not in self.schedules:
+                    self._schedule(
+                        ControllerSchedule(controller_id), now + random.uniform(0, spread)
+                    )
+
+        for controller_id in list(self.schedules):
+            if controller_id not in owned:
+                del self.schedules[controller_id]
+                get_gateway().untrack(controller_id)
+
+    def _pop_due(self) -> list[str]:
+        """Take every controller whose next check is due."""
+        now = time.monotonic()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            next_due, controller_id = heapq.heappop(self._heap)
+            schedule = self.schedules.get(controller_id)
+            # Skip entries superseded by a later _schedule() or a dropped controller
+            if schedule is None or schedule.next_due != next_due:
+                continue
+            # Never run two checks of one controller at once; re-check once it finishes
+            if controller_id in self._in_flight:
+                self._recheck.add(controller_id)
+                continue
+            due.append(controller_id)
+        return due
+
+    async def _check_due_controllers(self) -> int:
+        """
+        Start a check for every controller that is due.
+
+        Each check runs as its own task, at most `concurrency` at a time
+        across the worker, so a slow controller never holds back the others:
+        the loop keeps taking controllers off the heap while checks run.
+        Each controller's next check is scheduled as soon as its own check
+        finishes.
+
+        Returns:
+            Number of checks started
+        """
+        due = self._pop_due()
+        if not due:
+            return 0
+
+        try:
+            async with get_pool().acquire() as conn:
+                controllers = await conn.fetch(
+                    """
+                    SELECT id, user_id, url, access_token_encrypted, connection_status,
+                           last_seen, last_error, ha_version
+                    FROM master_controllers
+                    WHERE id = ANY($1::uuid[])
+                    """,
+                    [UUID(controller_id) for controller_id in due],
+                )
+        except Exception as e:
+            # They are off the heap now; put them back or they are never checked again
+            logger.error(f"Error loading {len(due)} due controllers: {e}")
+            retry_at = time.monotonic() + FETCH_RETRY_DELAY
+            for controller_id in due:
+                schedule = self.schedules.get(controller_id)
+                if schedule is not None:
+                    self._schedule(schedule, retry_at)
+            return 0
+
+        # Controllers deleted since they were scheduled just drop out
+        found = {str(controller["id"]) for controller in controllers}
+        for controller_id in due:
+            if controller_id not in found:
+                self.schedules.pop(controller_id, None)
+                get_gateway().untrack(controller_id)
 
         for controller in controllers:
-            await self._check_controller(controller)
+            self._in_flight.add(str(controller["id"]))
+            check = asyncio.create_task(self._run_check(controller))
+            self._checks.add(check)
+            check.add_done_callback(self._checks.discard)
+        return len(controllers)
+
+    async def _run_check(self, controller: dict):
+        """Check one controller, schedule its next check and queue its result."""
+        controller_id = str(controller["id"])
+        try:
+            async with self._slots:
+                started = time.monotonic()
+                result = await self._check_with_timeout(controller)
+        finally:
+            self._in_flight.discard(controller_id)
+
+        self._record_history([controller], [result])
+        self._reschedule_after(controller_id, controller, result)
+        if controller_id in self._recheck:
+            self._recheck.discard(controller_id)
+            schedule = self.schedules.get(controller_id)
+            if schedule is not None:
+                self._schedule(schedule, time.monotonic())
+
+        if self._results_since is None:
+            self._results_since = time.monotonic()
+        self._results.append((controller, result, started))
+        self._wakeup.set()
+
+    def _results_due(self) -> bool:
+        """Whether finished checks should be written back now."""
+        if not self._results:
+            return False
+        if not self._in_flight:
+            return True
+        waited = time.monotonic() - self._results_since
+        return waited >= settings.heartbeat_result_flush_window
+
+    async def _flush_results(self) -> SweepStats | None:
+        """Write back every finished check with one batched update."""
+        batch, self._results = self._results, []
+        self._results_since = None
+        if not batch:
+            return None
+
+        controllers = [controller for controller, _, _ in batch]
+        results = [result for _, result, _ in batch]
+        stats = SweepStats(interval=self.interval, fleet=self.fleet, controllers=len(batch))
+        for result in results:
+            stats.record(result)
+        stats.written = await self._write_results(controllers, results)
+
+        if (
+            len(self._history) >= settings.heartbeat_history_batch_size
+            or time.monotonic() - self._history_flushed >= settings.heartbeat_history_flush_interval
+        ):
+            await self._flush_history()
+
+        stats.duration = time.monotonic() - min(started for _, _, started in batch)
+        self.last_sweep = stats
+
+        if stats.overran:
+            logger.warning(
+                f"Heartbeat checks took {stats.duration:.1f}s for {stats.controllers} "
+                f"controllers, longer than the {self.interval}s interval"
+            )
+        else:
+            logger.debug(
+                f"Heartbeat wrote back {stats.checked} checks from the last "
+                f"{stats.duration:.1f}s ({stats.timeouts} timeouts, {stats.written} written)"
+            )
+
+        return stats
 
-    async def _check_controller(self, controller: dict):
-        """Check a single controller and update its status."""
+    def _record_history(self, controllers: list, results: list[HeartbeatResult]):
+        """
+        Buffer one controller_heartbeats row per probe.
+
+        A row's span is the time since the previous probe, and it is recorded
+        under the status that previous probe found, since that is the last
+        status known for the span. Otherwise a recovery probe after a long
+        backoff or an open breaker would count the whole outage as online.
+        Must run before _reschedule_after() stores the new status.
+        """
+        if not settings.heartbeat_history_enabled:
+            return
+
+        now = time.monotonic()
+        for controller, result in zip(controllers, results):
+            schedule = self.schedules.get(str(controller["id"]))
+            if schedule is None:
+                continue
+            if schedule.last_checked is None:
+                # First probe since this worker took the controller on
+                span, span_status = self.interval, result.status
+            else:
+                span = now - schedule.last_checked
+                span_status = schedule.status or result.status
+            schedule.last_checked = now
+            self._history.append(
+                (result.checked_at, controller["id"], span_status, result.rtt_ms, span)
+            )
+
+    async def _flush_history(self):
+        """Write buffered heartbeat history with one COPY."""
+        batch, self._history = self._history, []
+        self._history_flushed = time.monotonic()
+        if not batch:
+            return
+
+        try:
+            async with get_pool().acquire() as conn:
+                orphaned = await copy_controller_rows(
+                    conn, "controller_heartbeats", batch, HISTORY_COLUMNS
+                )
+        except Exception as e:
+            self.history_failed += len(batch)
+            logger.error(f"Error writing {len(batch)} heartbeat history rows: {e}")
+            return
+
+        self.history_written += len(batch) - orphaned
+
+    def _reschedule_after(self, controller_id: str, controller: dict, result: HeartbeatResult):
+        """Work out when a controller is next checked from the result of this check."""
+        schedule = self.schedules.get(controller_id)
+        if schedule is None:
+            return
+
+        previous = schedule.status or controller["connection_status"]
+        if result.status != previous:
+            schedule.fast_probes = settings.heartbeat_flap_probes
+        schedule.status = result.status
+
+        if result.status == "online":
+            if schedule.breaker_open:
+                logger.info(f"Circuit breaker closed for controller {controller_id}")
+            schedule.failures = 0
+            schedule.breaker_open = False
+            delay = self.interval
+        else:
+            schedule.failures += 1
+            delay = min(
+                self.interval * 2 ** (schedule.failures - 1), settings.heartbeat_max_backoff
+            )
+            if schedule.failures >= settings.heartbeat_breaker_threshold:
+                if not schedule.breaker_open:
+                    logger.info(
+                        f"Circuit breaker opened for controller {controller_id} after "
+                        f"{schedule.failures} failed checks"
+                    )
+                schedule.breaker_open = True
+                schedule.fast_probes = 0
+                delay = settings.heartbeat_breaker_cooldown
+
+        if schedule.fast_probes > 0:
+            schedule.fast_probes -= 1
+            delay = min(delay, settings.heartbeat_flap_interval)
+
+        # Up to 10% jitter so controllers that failed together don't stay in lockstep
+        delay *= 1 + random.uniform(0, 0.1)
+        self._schedule(schedule, time.monotonic() + delay)
+
+    def schedule_stats(self) -> dict:
+        """Counts of owned controllers by scheduling state."""
+        now = time.monotonic()
+        schedules = self.schedules.values()
+        return {
+            "scheduled": len(self.schedules),
+            "backing_off": sum(
+                1 for s in schedules if s.failures and not s.breaker_open
+            ),
+            "breaker_open": sum(1 for s in schedules if s.breaker_open),
+            "fast_probing": sum(1 for s in schedules if s.fast_probes),
+            "in_flight": len(self._in_flight),
+            "next_due_in": max(self._heap[0][0] - now, 0) if self._heap else None,
+            "history_buffered": len(self._history),
+            "history_written": self.history_written,
+            "history_failed": self.history_failed,
+        }
+
+    async def _check_with_timeout(self, controller: dict) -> HeartbeatResult:
+        """Run a controller check, bounding how long a single controller can hold a slot."""
+        try:
+            return await asyncio.wait_for(
+                self._check_controller(controller), timeout=self.check_timeout
+            )
+        except asyncio.TimeoutError:
+            get_gateway().untrack(controller["id"])
+            return HeartbeatResult(controller["id"], "error", TIMEOUT_ERROR)
+
+    async def _check_controller(self, controller: dict) -> HeartbeatResult:
+        """
+        Check a single controller and return its new status.
+
+        A controller with a live gateway WebSocket is checked with a ping over
+        that socket. If there is none, or the ping gets no pong within
+        `heartbeat_ping_timeout`, one GET /api/ is made; the version is only
+        fetched from /api/config when the controller comes back online, has
+        no version stored, or its version is older than
+        `heartbeat_version_refresh`.
+        """
         controller_id = controller["id"]
         url = controller["url"]
         encrypted_token = controller["access_token_encrypted"]
-        old_status = controller["connection_status"]
+        gateway = get_gateway()
 
         try:
+            stream = gateway.live_stream(controller_id)
+            if stream:
+                started = time.perf_counter()
+                if await stream.ping(timeout=settings.heartbeat_ping_timeout):
+                    return HeartbeatResult(
+                        controller_id,
+                        "online",
+                        version=stream.ha_version,
+                        rtt_ms=(time.perf_counter() - started) * 1000,
+                    )
+                # No pong: the socket is stale, so drop it and let REST decide
+                gateway.untrack(controller_id)
+
             # Decrypt token
             access_token = decrypt_token(encrypted_token)
 
             # Test connection
             client = HomeAssistantClient(url, access_token)
+            started = time.perf_counter()
             success, error = await client.test_connection()
+            rtt_ms = (time.perf_counter() - started) * 1000
 
-            if success:
-                # Get version info
+            if not success:
+                gateway.untrack(controller_id)
+                return HeartbeatResult(controller_id, "offline", error)
+
+            # Keep a live entity mirror for online controllers
+            gateway.track(controller_id, url, access_token, controller["user_id"])
+
+            # Get version info
+            version = None
+            if self._version_due(controller):
                 config = await client.get_config()
                 version = config.get("version") if config else None
+                schedule = self.schedules.get(str(controller_id))
+                if schedule and version:
+                    schedule.version_checked = time.monotonic()
 
-                # Update to online
-                async with get_pool().acquire() as conn:
-                    await conn.execute(
-                        """
-                        UPDATE master_controllers
-                        SET connection_status = 'online',
-                            last_seen = $1,
-                            last_error = NULL,
-                            ha_version = $2,
-                            updated_at = $1
-                        WHERE id = $3
-                        """,
-                        datetime.utcnow(),
-                        version,
-                        controller_id,
-                    )
+            return HeartbeatResult(controller_id, "online", version=version, rtt_ms=rtt_ms)
 
-                new_status = "online"
-            else:
-                # Update to offline with error
-                async with get_pool().acquire() as conn:
-                    await conn.execute(
-                        """
-                        UPDATE master_controllers
-                        SET connection_status = 'offline',
-                            last_error = $1,
-                            updated_at = $2
-                        WHERE id = $3
-                        """,
-                        error,
-                        datetime.utcnow(),
-                        controller_id,
-                    )
+        except Exception as e:
+            logger.error(f"Error checking controller {controller_id}: {e}")
+            gateway.untrack(controller_id)
+            return HeartbeatResult(controller_id, "error", str(e))
 
-                new_status = "offline"
+    def _version_due(self, controller: dict) -> bool:
+        """Whether a successful REST check should also refresh the HA version."""
+        if controller["connection_status"] != "online" or controller["ha_version"] is None:
+            return True
+        schedule = self.schedules.get(str(controller["id"]))
+        if schedule is None:
+            return True
+        return time.monotonic() - schedule.version_checked >= settings.heartbeat_version_refresh
 
-            # Publish status change event if status changed
-            if new_status != old_status:
-                await self._publish_status_change(controller_id, old_status, new_status)
+    def _needs_write(self, controller: dict, result: HeartbeatResult) -> bool:
+        """
+        Decide whether a heartbeat result changes the stored row.
 
-        except Exception as e:
-            logger.error(f"Error checking controller {controller_id}: {e}")
+        Healthy controllers only get last_seen refreshed once it is older than
+        `heartbeat_last_seen_resolution`, so a steady fleet writes nothing.
+        """
+        if result.status != controller["connection_status"]:
+            return True
+        if result.error != controller["last_error"]:
+            return True
+        if result.version is not None and result.version != controller["ha_version"]:
+            return True
+        if result.status == "online":
+            last_seen = controller["last_seen"]
+            resolution = timedelta(seconds=settings.heartbeat_last_seen_resolution)
+            return last_seen is None or result.checked_at - last_seen >= resolution
+        return False
+
+    async def _write_results(self, controllers: list, results: list[HeartbeatResult]) -> int:
+        """
+        Flush a sweep's results with one set-based UPDATE and publish status changes.
 
-            # Update to error status
+        Returns:
+            Number of controller rows written
+        """
+        changed = [
+            (controller, result)
+            for controller, result in zip(controllers, results)
+            if self._needs_write(controller, result)
+        ]
+        if not changed:
+            return 0
+
+        try:
             async with get_pool().acquire() as conn:
                 await conn.execute(
                     """
-                    UPDATE master_controllers
-                    SET connection_status = 'error',
-                        last_error = $1,
-                        updated_at = $2
-                    WHERE id = $3
+                    UPDATE master_controllers AS mc
+                    SET connection_status = r.status::connection_status,
+                        last_error = r.last_error,
+                        ha_version = COALESCE(r.ha_version, mc.ha_version),
+                        last_seen = COALESCE(r.last_seen, mc.last_seen),
+                        updated_at = $6
+                    FROM unnest($1::uuid[], $2::text[], $3::text[], $4::text[], $5::timestamptz[])
+                        AS r(id, status, last_error, ha_version, last_seen)
+                    WHERE mc.id = r.id
                     """,
-                    str(e),
-                    datetime.utcnow(),
-                    controller_id,
+                    [result.controller_id for _, result in changed],
+                    [result.status for _, result in changed],
+                    [result.error for _, result in changed],
+                    [result.version for _, result in changed],
+                    [
+                        result.checked_at if result.status == "online" else None
+                        for _, result in changed
+                    ],
+                    datetime.now(timezone.utc),
+                )
+        except Exception as e:
+            logger.error(f"Error writing heartbeat results: {e}")
+            return 0
+
+        # Publish status change events once the new status is persisted
+        for controller, result in changed:
+            old_status = controller["connection_status"]
+            if result.status != old_status:
+                await self._publish_status_change(
+                    result.controller_id, old_status, result.status, controller["user_id"]
                 )
 
-            if old_status != "error":
-                await self._publish_status_change(controller_id, old_status, "error")
+        return len(changed)
 
-    async def _publish_status_change(self, controller_id: str, old_status: str, new_status: str):
-        """Publish a status change event to Redis."""
+    async def _publish_status_change(
+        self, controller_id: str, old_status: str, new_status: str, user_id: str = None
+    ):
+        """Publish a status change event to Redis, and to the owner's devices channel."""
         try:
             redis = get_redis()
             message = f"{controller_id}:{old_status}:{new_status}"
             await redis.publish("controller_status_changes", message)
+            if user_id:
+                await redis.publish(
+                    user_channel(user_id, "devices"),
+                    make_envelope(
+                        "device.status_changed",
+                        {
+                            "device_id": str(controller_id),
+                            "old_status": old_status,
+                            "new_status": new_status,
+                        },
+                    ),
+                )
             logger.info(f"Controller {controller_id} status: {old_status} -> {new_status}")
         except Exception as e:
             logger.error(f"Error publishing status change: {e}")
@@ -163,3 +681,16 @@ def get_connection_manager() -> ConnectionManager:
     if _connection_manager is None:
         _connection_manager = ConnectionManager()
     return _connection_manager
+
+
+async def reschedule_controller(controller_id) -> None:
+    """
+    Have whichever worker owns a controller re-check it now.
+
+    Call after changing its URL or token, or after deleting it so the owner
+    stops its stream.
+    """
+    await get_invalidation_bus().publish("controller", str(controller_id))
+
+
+get_invalidation_bus().register("controller", lambda key: get_connection_manager().reschedule(key))
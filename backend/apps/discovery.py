@@ -1,11 +1,12 @@
 import asyncio
-import socket
 from typing import List
 
 import httpx
 from zeroconf import ServiceBrowser, ServiceListener, Zeroconf
 from zeroconf.asyncio import AsyncZeroconf
 
+from apps.resolver import get_resolver
+
 
 class DiscoveredController:
     """Represents a discovered Home Assistant instance."""
@@ -63,9 +64,8 @@ async def probe_host(hostname: str, port: int) -> dict | None:
     try:
         # First resolve the hostname to get the IP
         # (we use the IP for the actual connection to avoid anyio DNS issues in Docker)
-        try:
-            ip = socket.gethostbyname(hostname)
-        except socket.gaierror:
+        ip = await get_resolver().resolve(hostname)
+        if ip is None:
             return None
 
         # Use IP for connection but keep hostname for the returned URL
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+from typing import Optional
+
+from pydantic import TypeAdapter
+
+from api.v1.schemas import EntityState
+from apps.ha_client import HomeAssistantClient
+from apps.ha_gateway import get_gateway
+from core.config import settings
+from core.encryption import decrypt_token
+from db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+_entity_list = TypeAdapter(list[EntityState])
+
+
+def build_entities(states: list[dict], domain: Optional[str] = None) -> list[EntityState]:
+    """Convert raw Home Assistant states to EntityState models, optionally filtered by domain."""
+    entities = []
+    for state in states:
+        # Extract domain from entity_id (e.g., "light.living_room" -> "light")
+        entity_domain = state["entity_id"].split(".")[0] if "." in state["entity_id"] else "unknown"
+
+        # Filter by domain if specified
+        if domain and entity_domain != domain:
+            continue
+
+        # Extract friendly name from attributes
+        friendly_name = state.get("attributes", {}).get("friendly_name")
+
+        entities.append(
+            EntityState(
+                entity_id=state["entity_id"],
+                state=state["state"],
+                last_changed=state["last_changed"],
+                last_updated=state["last_updated"],
+                friendly_name=friendly_name,
+                domain=entity_domain,
+                attributes=state.get("attributes", {}),
+            )
+        )
+
+    return entities
+
+
+def make_etag(body: str) -> str:
+    """Strong ETag from a hash of the response body."""
+    return '"' + hashlib.blake2b(body.encode(), digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _cache_key(controller_id) -> str:
+    return f"entities:{controller_id}"
+
+
+async def invalidate_entity_cache(controller_id) -> None:
+    """Drop every cached listing for a controller."""
+    try:
+        await get_redis().delete(_cache_key(controller_id))
+    except Exception as e:
+        logger.error(f"Error invalidating entity cache: {e}")
+
+
+async def get_entity_listing(
+    controller_id, url: str, encrypted_token: str, domain: Optional[str] = None
+) -> Optional[tuple[str, str]]:
+    """
+    Get the serialized entity list for a controller.
+
+    Listings are cached in Redis per controller and domain for
+    `entity_cache_ttl` seconds. On a miss, states come from the live gateway
+    mirror on the worker that owns the controller, the owner's shared copy
+    in Redis on any other worker, or the REST API while neither is warm.
+
+    Returns:
+        Tuple of (json_body: str, etag: str), or None if Home Assistant is unreachable
+    """
+    key = _cache_key(controller_id)
+    field = domain or "*"
+
+    try:
+        cached = await get_redis().hmget(key, f"{field}:body", f"{field}:etag")
+        if cached[0] is not None and cached[1] is not None:
+            return cached[0], cached[1]
+    except Exception as e:
+        logger.error(f"Error reading entity cache: {e}")
+
+    gateway = get_gateway()
+    states = gateway.get_states(controller_id)
+    if states is None:
+        states = await gateway.get_shared_states(controller_id)
+
+    if states is None:
+        access_token = decrypt_token(encrypted_token)
+        ha_client = HomeAssistantClient(url, access_token)
+        states = await ha_client.get_states()
+
+    if states is None:
+        return None
+
+    body = _entity_list.dump_json(build_entities(states, domain)).decode()
+    etag = make_etag(body)
+
+    try:
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={f"{field}:body": body, f"{field}:etag": etag})
+            pipe.expire(key, settings.entity_cache_ttl, nx=True)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Error writing entity cache: {e}")
+
+    return body, etag
@@ -10,7 +10,12 @@ sub-applications within Quick Controller. It includes:
 """
 
 from apps.framework.base import AppContract
-from apps.framework.permissions import check_app_access, require_app_access
+from apps.framework.permissions import (
+    check_app_access,
+    get_user_permissions,
+    invalidate_permissions,
+    require_app_access,
+)
 from apps.framework.registry import AppRegistry, get_registry
 
 __all__ = [
@@ -18,5 +23,7 @@ __all__ = [
     "AppRegistry",
     "get_registry",
     "check_app_access",
+    "get_user_permissions",
+    "invalidate_permissions",
     "require_app_access",
 ]
@@ -1,23 +1,129 @@
 from typing import Callable
 
 from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
 
 from apps.framework.registry import get_registry
-from core.deps import get_current_user
+from core.cache import TTLCache
+from core.config import settings
+from core.deps import (
+    RequestConnection,
+    get_db,
+    get_user_from_token,
+    security,
+    user_cache,
+    user_id_from_token,
+)
+from core.invalidation import get_invalidation_bus
 from db.postgres import get_pool
 
+# Explicit app permissions per user: user_id -> {app_id: has_access}
+permission_cache = TTLCache(
+    maxsize=settings.permission_cache_size, ttl=settings.permission_cache_ttl
+)
+get_invalidation_bus().register("permissions", permission_cache.delete)
 
-async def check_app_access(app_id: str, user_id: str) -> bool:
+
+async def invalidate_permissions(user_id) -> None:
+    """Evict a user's permissions from every worker's cache. Call after changing them."""
+    await get_invalidation_bus().publish("permissions", str(user_id))
+
+
+async def get_user_permissions(user_id, db: RequestConnection = None) -> dict[str, bool]:
+    """
+    Get a user's explicit app permissions.
+
+    Loaded from user_app_permissions on first use and then served from the
+    in-process cache until invalidated.
+
+    Args:
+        user_id: The user's UUID
+        db: Optional request connection to reuse
+
+    Returns:
+        Dict mapping app_id to has_access for every explicit permission row
+    """
+    key = str(user_id)
+    permissions = permission_cache.get(key)
+    if permissions is not None:
+        return permissions
+
+    query = """
+        SELECT app_id, has_access
+        FROM user_app_permissions
+        WHERE user_id = $1
+    """
+    if db is not None:
+        conn = await db.acquire()
+        rows = await conn.fetch(query, user_id)
+    else:
+        async with get_pool().acquire() as conn:
+            rows = await conn.fetch(query, user_id)
+
+    permissions = {row["app_id"]: row["has_access"] for row in rows}
+    permission_cache.set(key, permissions)
+    return permissions
+
+
+async def get_user_with_permissions(
+    token: str, db: RequestConnection
+) -> tuple[dict, dict[str, bool]]:
+    """
+    Load the user behind an access token together with their app permissions.
+
+    Whatever is missing from the user and permission caches is fetched with a
+    single statement on the request connection, and both caches are filled.
+
+    Raises:
+        HTTPException: 401 if the token is invalid or the user no longer exists
+    """
+    user_id = user_id_from_token(token)
+    user = user_cache.get(user_id)
+    permissions = permission_cache.get(user_id)
+
+    if user is not None and permissions is not None:
+        return dict(user), permissions
+
+    conn = await db.acquire()
+    row = await conn.fetchrow(
+        """
+        SELECT u.id, u.email, p.app_ids, p.app_access
+        FROM users u
+        LEFT JOIN LATERAL (
+            SELECT array_agg(app_id) AS app_ids, array_agg(has_access) AS app_access
+            FROM user_app_permissions
+            WHERE user_id = u.id
+        ) p ON true
+        WHERE u.id = $1
+        """,
+        user_id,
+    )
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+        )
+
+    user = {"id": row["id"], "email": row["email"]}
+    permissions = dict(zip(row["app_ids"] or [], row["app_access"] or []))
+    user_cache.set(user_id, user)
+    permission_cache.set(user_id, permissions)
+    return dict(user), permissions
+
+
+async def check_app_access(app_id: str, user_id: str, db: RequestConnection = None) -> bool:
     """
     Check if a user has access to a specific app.
 
     Access is determined by:
     1. If the app has default_access=True, all authenticated users have access
-    2. Otherwise, check the user_app_permissions table for explicit access
+    2. Otherwise, the user's explicit permission for the app (has_access)
 
     Args:
         app_id: The unique app identifier
         user_id: The user's UUID
+        db: Optional request connection to reuse
 
     Returns:
         True if the user has access, False otherwise
@@ -33,18 +139,9 @@ async def check_app_access(app_id: str, user_id: str) -> bool:
     if app.default_access:
         return True
 
-    # Check user_app_permissions table for explicit access
-    async with get_pool().acquire() as conn:
-        result = await conn.fetchval(
-            """
-            SELECT 1 FROM user_app_permissions
-            WHERE user_id = $1 AND app_id = $2
-            """,
-            user_id,
-            app_id,
-        )
-
-    return result is not None
+    # Check the user's explicit permissions
+    permissions = await get_user_permissions(user_id, db)
+    return permissions.get(app_id, False)
 
 
 def require_app_access(app_id: str) -> Callable:
@@ -69,18 +166,30 @@ def require_app_access(app_id: str) -> Callable:
         HTTPException: 403 Forbidden if the user lacks access
     """
 
-    async def dependency(current_user: dict = Depends(get_current_user)):
+    async def dependency(
+        credentials: HTTPAuthorizationCredentials = Depends(security),
+        db: RequestConnection = Depends(get_db),
+    ):
         """Dependency that validates app access for the current user."""
-        user_id = current_user["id"]
-
         try:
-            has_access = await check_app_access(app_id, user_id)
+            app = get_registry().get(app_id)
         except KeyError:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"App '{app_id}' not found",
             )
 
+        # Default-access apps only need the user; others load user and
+        # permissions together on the shared request connection
+        if app.default_access:
+            current_user = await get_user_from_token(credentials.credentials, db)
+            has_access = True
+        else:
+            current_user, permissions = await get_user_with_permissions(
+                credentials.credentials, db
+            )
+            has_access = permissions.get(app_id, False)
+
         if not has_access:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
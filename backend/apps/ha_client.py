@@ -1,17 +1,27 @@
-import socket
+import asyncio
+import hashlib
+import logging
+import time
 from urllib.parse import urlparse
 
 import httpx
 from typing import Optional
 
+from apps.resolver import get_resolver
+from apps.singleflight import get_single_flight
+from core.config import settings
 
-def resolve_url_to_ip(url: str) -> str:
+logger = logging.getLogger(__name__)
+
+
+async def resolve_url_to_ip(url: str) -> str:
     """
     Resolve a URL's hostname to IP address for Docker compatibility.
 
     In Docker, anyio/httpx can't resolve .local mDNS hostnames properly,
-    but socket.gethostbyname() works. This function converts URLs like
-    http://homeassistant.local:8123 to http://10.0.0.151:8123
+    but the system resolver does. This function converts URLs like
+    http://homeassistant.local:8123 to http://10.0.0.151:8123, using the
+    shared resolver's cache so the lookup never blocks the event loop.
     """
     parsed = urlparse(url)
     hostname = parsed.hostname
@@ -19,31 +29,169 @@ def resolve_url_to_ip(url: str) -> str:
     if not hostname:
         return url
 
-    try:
-        ip = socket.gethostbyname(hostname)
-        # Reconstruct URL with IP instead of hostname
-        if parsed.port:
-            netloc = f"{ip}:{parsed.port}"
-        else:
-            netloc = ip
-        return f"{parsed.scheme}://{netloc}{parsed.path}"
-    except socket.gaierror:
+    ip = await get_resolver().resolve(hostname)
+    if ip is None:
         # Can't resolve, return original URL
         return url
 
+    # Reconstruct URL with IP instead of hostname
+    if parsed.port:
+        netloc = f"{ip}:{parsed.port}"
+    else:
+        netloc = ip
+    return f"{parsed.scheme}://{netloc}{parsed.path}"
+
+
+class HAClientPool:
+    """
+    Keyed pool of long-lived httpx clients, one per controller URL and token.
+
+    Reusing a client keeps its connections alive between requests, so heartbeats
+    and entity fetches skip the TCP/TLS handshake. Clients that have not been
+    used for `idle_timeout` seconds are closed by a background task.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = None,
+        max_keepalive: int = None,
+        keepalive_expiry: float = None,
+        idle_timeout: int = None,
+        http2: bool = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.ha_http_max_connections,
+            max_keepalive_connections=max_keepalive or settings.ha_http_max_keepalive,
+            keepalive_expiry=keepalive_expiry or settings.ha_http_keepalive_expiry,
+        )
+        self.idle_timeout = idle_timeout or settings.ha_http_idle_timeout
+        self.http2 = settings.ha_http2 if http2 is None else http2
+        self._clients: dict[tuple[str, str], httpx.AsyncClient] = {}
+        self._last_used: dict[tuple[str, str], float] = {}
+        self._task: asyncio.Task = None
+
+        if self.http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+                self.http2 = False
+
+    def get(self, base_url: str, access_token: str) -> httpx.AsyncClient:
+        """Get the shared client for a controller, creating it on first use."""
+        key = (base_url, hashlib.sha256(access_token.encode()).hexdigest())
+        client = self._clients.get(key)
+
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=base_url,
+                headers={
+                    "Authorization": f"Bearer {access_token}",
+                    "Content-Type": "application/json",
+                },
+                limits=self.limits,
+                http2=self.http2,
+                timeout=10.0,
+            )
+            self._clients[key] = client
+
+        self._last_used[key] = time.monotonic()
+        return client
+
+    async def start(self):
+        """Start the background idle-eviction task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._evict_loop())
+
+    async def close(self):
+        """Stop eviction and close every pooled client."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        clients = list(self._clients.values())
+        self._clients.clear()
+        self._last_used.clear()
+        for client in clients:
+            await client.aclose()
+
+    async def evict_idle(self) -> int:
+        """Close clients that have been idle longer than idle_timeout."""
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [key for key, last_used in self._last_used.items() if last_used < cutoff]
+
+        for key in idle:
+            client = self._clients.pop(key, None)
+            self._last_used.pop(key, None)
+            if client:
+                await client.aclose()
+
+        return len(idle)
+
+    async def _evict_loop(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 60))
+            try:
+                evicted = await self.evict_idle()
+                if evicted:
+                    logger.debug(f"Closed {evicted} idle Home Assistant clients")
+            except Exception as e:
+                logger.error(f"Error evicting idle clients: {e}")
+
+    def stats(self) -> dict:
+        return {"clients": len(self._clients), "http2": self.http2}
+
+
+# Global client pool instance
+_client_pool: HAClientPool = None
+
+
+def get_client_pool() -> HAClientPool:
+    """Get the global Home Assistant client pool."""
+    global _client_pool
+    if _client_pool is None:
+        _client_pool = HAClientPool()
+    return _client_pool
+
 
 class HomeAssistantClient:
     """Client for interacting with Home Assistant REST API."""
 
     def __init__(self, url: str, access_token: str):
         self.url = url.rstrip("/")
-        # Resolve hostname to IP for Docker compatibility
-        self.resolved_url = resolve_url_to_ip(self.url)
         self.access_token = access_token
-        self.headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json",
-        }
+
+    async def _get(self, path: str, timeout: float = 10.0) -> httpx.Response:
+        """Issue a GET through the pooled client for this controller."""
+        # Resolve hostname to IP for Docker compatibility
+        resolved_url = await resolve_url_to_ip(self.url)
+        client = get_client_pool().get(resolved_url, self.access_token)
+        return await client.get(path, timeout=timeout)
+
+    async def _get_json(self, path: str, timeout: float = 10.0):
+        """
+        GET a JSON endpoint, sharing one upstream call among concurrent identical requests.
+
+        Returns:
+            Decoded JSON body, or None on a non-200 response or any failure
+        """
+
+        async def fetch():
+            try:
+                response = await self._get(path, timeout=timeout)
+                if response.status_code == 200:
+                    return response.json()
+                return None
+            except Exception:
+                return None
+
+        token_hash = hashlib.sha256(self.access_token.encode()).hexdigest()[:16]
+        key = f"{self.url}:{token_hash}:{path}"
+        return await get_single_flight().do(key, fetch)
 
     async def test_connection(self) -> tuple[bool, Optional[str]]:
         """
@@ -53,15 +201,18 @@ class HomeAssistantClient:
             Tuple of (success: bool, error_message: Optional[str])
         """
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.resolved_url}/api/", headers=self.headers)
-                if response.status_code == 200:
-                    return True, None
-                else:
-                    return False, f"HTTP {response.status_code}: {response.text}"
+            response = await self._get("/api/", timeout=10.0)
+            if response.status_code == 200:
+                return True, None
+            else:
+                return False, f"HTTP {response.status_code}: {response.text}"
         except httpx.TimeoutException:
             return False, "Connection timeout"
         except httpx.ConnectError:
+            # The host may have moved; look it up again next time
+            hostname = urlparse(self.url).hostname
+            if hostname:
+                get_resolver().forget(hostname)
             return False, "Connection refused - unable to reach Home Assistant"
         except Exception as e:
             return False, f"Connection error: {str(e)}"
@@ -73,14 +224,7 @@ class HomeAssistantClient:
         Returns:
             Config dict with version info or None on failure
         """
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.resolved_url}/api/config", headers=self.headers)
-                if response.status_code == 200:
-                    return response.json()
-                return None
-        except Exception:
-            return None
+        return await self._get_json("/api/config", timeout=10.0)
 
     async def get_status(self) -> Optional[dict]:
         """
@@ -89,14 +233,7 @@ class HomeAssistantClient:
         Returns:
             Status dict or None on failure
         """
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.resolved_url}/api/", headers=self.headers)
-                if response.status_code == 200:
-                    return response.json()
-                return None
-        except Exception:
-            return None
+        return await self._get_json("/api/", timeout=5.0)
 
     async def get_states(self) -> Optional[list[dict]]:
         """
@@ -105,14 +242,7 @@ class HomeAssistantClient:
         Returns:
             List of entity state dicts or None on failure
         """
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.resolved_url}/api/states", headers=self.headers)
-                if response.status_code == 200:
-                    return response.json()
-                return None
-        except Exception:
-            return None
+        return await self._get_json("/api/states", timeout=10.0)
 
 
 async def test_ha_connection(url: str, access_token: str) -> tuple[bool, Optional[str], Optional[str]]:
@@ -0,0 +1,439 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Optional
+
+import websockets
+
+from apps.ha_client import resolve_url_to_ip
+from apps.leases import get_worker_leases, rendezvous_owner
+from apps.realtime import get_publisher, make_envelope, user_channel
+from core.config import settings
+from db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class EntityMirror:
+    """In-memory copy of one controller's entity states."""
+
+    def __init__(self):
+        self.states: dict[str, dict] = {}
+        self.ready = False
+        self.updated_at: float = None
+        # Changes not yet copied to the shared mirror in Redis
+        self.dirty: set[str] = set()
+        self.needs_full_publish = True
+
+    def load(self, states: list[dict]):
+        """Replace the mirror with a full snapshot."""
+        self.states = {state["entity_id"]: state for state in states}
+        self.ready = True
+        self.updated_at = time.monotonic()
+        self.dirty.clear()
+        self.needs_full_publish = True
+
+    def apply(self, entity_id: str, new_state: Optional[dict]):
+        """Apply a single state_changed event. A missing new_state means the entity was removed."""
+        if new_state is None:
+            self.states.pop(entity_id, None)
+        else:
+            self.states[entity_id] = new_state
+        self.updated_at = time.monotonic()
+        self.dirty.add(entity_id)
+
+    def snapshot(self) -> list[dict]:
+        return list(self.states.values())
+
+
+class ControllerStream:
+    """
+    WebSocket subscription to one controller's state_changed events.
+
+    Subscribes before requesting the get_states snapshot, so no event can be
+    missed between the two. Reconnects with backoff until cancelled.
+    """
+
+    def __init__(
+        self,
+        controller_id: str,
+        url: str,
+        access_token: str,
+        on_state_changed: Callable[[str, str, Optional[dict]], None] = None,
+        user_id: str = None,
+    ):
+        self.controller_id = controller_id
+        self.url = url
+        self.access_token = access_token
+        self.user_id = user_id
+        self.on_state_changed = on_state_changed
+        self.mirror = EntityMirror()
+        self.task: asyncio.Task = None
+        self.ws = None  # Set while connected and authenticated
+        self.ha_version: Optional[str] = None
+        self._next_id = 1
+        self._pings: dict[int, asyncio.Future] = {}
+
+    async def ws_url(self) -> str:
+        base = await resolve_url_to_ip(self.url.rstrip("/"))
+        if base.startswith("https://"):
+            base = "wss://" + base[len("https://"):]
+        elif base.startswith("http://"):
+            base = "ws://" + base[len("http://"):]
+        return f"{base}/api/websocket"
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+        self.mirror.ready = False
+
+    @property
+    def live(self) -> bool:
+        return self.ws is not None
+
+    async def ping(self, timeout: float) -> bool:
+        """
+        Send a Home Assistant ping over the live socket and wait for its pong.
+
+        Returns:
+            True if Home Assistant answered within the timeout
+        """
+        if self.ws is None:
+            return False
+
+        message_id = self._message_id()
+        future = asyncio.get_running_loop().create_future()
+        self._pings[message_id] = future
+        try:
+            await self.ws.send(json.dumps({"id": message_id, "type": "ping"}))
+            await asyncio.wait_for(future, timeout=timeout)
+            return True
+        except Exception:
+            return False
+        finally:
+            self._pings.pop(message_id, None)
+
+    def _message_id(self) -> int:
+        message_id = self._next_id
+        self._next_id += 1
+        return message_id
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            try:
+                await self._connect()
+                backoff = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"WebSocket for controller {self.controller_id} failed: {e}")
+
+            self.ws = None
+            self.mirror.ready = False
+            for future in self._pings.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("WebSocket closed"))
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, settings.ha_ws_max_backoff)
+
+    async def _connect(self):
+        async with websockets.connect(
+            await self.ws_url(),
+            max_size=settings.ha_ws_max_message_size,
+            open_timeout=10,
+        ) as ws:
+            # Authenticate
+            message = json.loads(await ws.recv())
+            if message.get("type") != "auth_required":
+                raise RuntimeError(f"Unexpected handshake message: {message.get('type')}")
+
+            await ws.send(json.dumps({"type": "auth", "access_token": self.access_token}))
+            message = json.loads(await ws.recv())
+            if message.get("type") != "auth_ok":
+                raise RuntimeError("Authentication rejected")
+            self.ha_version = message.get("ha_version")
+
+            # Subscribe first, then seed the mirror with one snapshot
+            self._next_id = 1
+            subscribe_id = self._message_id()
+            await ws.send(
+                json.dumps(
+                    {"id": subscribe_id, "type": "subscribe_events", "event_type": "state_changed"}
+                )
+            )
+            snapshot_id = self._message_id()
+            await ws.send(json.dumps({"id": snapshot_id, "type": "get_states"}))
+            self.ws = ws
+
+            async for raw in ws:
+                message = json.loads(raw)
+                message_type = message.get("type")
+
+                if message_type == "event" and message.get("id") == subscribe_id:
+                    data = message["event"]["data"]
+                    self.mirror.apply(data["entity_id"], data.get("new_state"))
+                    if self.on_state_changed:
+                        self.on_state_changed(
+                            self.controller_id, data["entity_id"], data.get("new_state")
+                        )
+                elif message_type == "result" and message.get("id") == snapshot_id:
+                    if not message.get("success"):
+                        raise RuntimeError("get_states request failed")
+                    self.mirror.load(message["result"])
+                    logger.info(
+                        f"Entity mirror for controller {self.controller_id} seeded "
+                        f"with {len(self.mirror.states)} entities"
+                    )
+                elif message_type == "pong":
+                    future = self._pings.get(message.get("id"))
+                    if future and not future.done():
+                        future.set_result(True)
+
+
+def shared_mirror_key(controller_id, worker_id: str) -> str:
+    return f"entities:mirror:{controller_id}:{worker_id}"
+
+
+class HAGateway:
+    """
+    Keeps a live entity-state mirror for each online controller.
+
+    The connection manager tracks controllers as they come online and untracks
+    them when they go offline; routes read entity states from the mirror and
+    only fall back to the REST API while a mirror is cold.
+
+    Streams only run on the worker that owns the controller's lease. So the
+    other workers can serve entities without the REST call, the owner copies
+    each mirror into a Redis hash (entity_id -> state JSON) every
+    `ha_mirror_publish_interval` seconds, sending only what changed. The hash
+    is keyed by the owner's worker id, so a worker handing a controller over
+    never deletes the new owner's copy, and it expires `ha_mirror_shared_ttl`
+    seconds after the owner stops refreshing it.
+    """
+
+    def __init__(self):
+        self.streams: dict[str, ControllerStream] = {}
+        self.listeners: list[Callable[[str, str, Optional[dict]], None]] = []
+        self.publish_task: asyncio.Task = None
+        self._published: set[str] = set()  # Controllers with a shared mirror in Redis
+        self._retired: set[str] = set()  # Shared mirrors to delete on the next publish
+        self._expiry_refreshed = float("-inf")
+
+    def add_listener(self, listener: Callable[[str, str, Optional[dict]], None]):
+        """
+        Register a callback for every mirrored state change.
+
+        Called as listener(controller_id, entity_id, new_state) on the event loop,
+        so it must not block.
+        """
+        self.listeners.append(listener)
+
+    def _dispatch(self, controller_id: str, entity_id: str, new_state: Optional[dict]):
+        for listener in self.listeners:
+            try:
+                listener(controller_id, entity_id, new_state)
+            except Exception as e:
+                logger.error(f"Error in state change listener: {e}")
+
+    def track(self, controller_id, url: str, access_token: str, user_id=None):
+        """Open (or keep) a stream for a controller. Restarts it if the URL or token changed."""
+        controller_id = str(controller_id)
+        stream = self.streams.get(controller_id)
+
+        if stream and stream.url == url and stream.access_token == access_token:
+            return
+
+        if stream:
+            stream.stop()
+
+        stream = ControllerStream(
+            controller_id,
+            url,
+            access_token,
+            self._dispatch,
+            str(user_id) if user_id else None,
+        )
+        stream.start()
+        self.streams[controller_id] = stream
+
+        if self.publish_task is None:
+            self.publish_task = asyncio.create_task(self._publish_loop())
+
+    def untrack(self, controller_id):
+        """Close a controller's stream and drop its mirror."""
+        controller_id = str(controller_id)
+        stream = self.streams.pop(controller_id, None)
+        if stream:
+            stream.stop()
+        if controller_id in self._published:
+            self._retired.add(controller_id)
+
+    def live_stream(self, controller_id) -> Optional[ControllerStream]:
+        """The controller's stream, if it is currently connected and authenticated."""
+        stream = self.streams.get(str(controller_id))
+        return stream if stream and stream.live else None
+
+    def owner(self, controller_id) -> Optional[str]:
+        """User id owning a tracked controller."""
+        stream = self.streams.get(str(controller_id))
+        return stream.user_id if stream else None
+
+    def get_states(self, controller_id) -> Optional[list[dict]]:
+        """
+        Get mirrored entity states for a controller.
+
+        Returns:
+            List of entity state dicts, or None if the mirror is cold
+        """
+        stream = self.streams.get(str(controller_id))
+        if not stream or not stream.mirror.ready:
+            return None
+        return stream.mirror.snapshot()
+
+    async def get_shared_states(self, controller_id) -> Optional[list[dict]]:
+        """
+        Get entity states from the shared mirror published by the controller's owner.
+
+        Returns:
+            List of entity state dicts, or None if the owner has none published
+        """
+        leases = get_worker_leases()
+        owner = rendezvous_owner(leases.workers, str(controller_id))
+        if owner is None or owner == leases.worker_id:
+            return None
+
+        try:
+            states = await get_redis().hvals(shared_mirror_key(controller_id, owner))
+        except Exception as e:
+            logger.error(f"Error reading shared entity mirror: {e}")
+            return None
+        return [json.loads(state) for state in states] or None
+
+    async def _publish_loop(self):
+        while True:
+            await asyncio.sleep(settings.ha_mirror_publish_interval)
+            try:
+                await self.publish_mirrors()
+            except Exception as e:
+                logger.error(f"Error publishing shared entity mirrors: {e}")
+                # Whatever was dirty is lost; rewrite every mirror next time
+                for stream in self.streams.values():
+                    stream.mirror.needs_full_publish = True
+
+    async def publish_mirrors(self):
+        """Copy mirror changes since the last call to Redis and refresh their expiry."""
+        worker_id = get_worker_leases().worker_id
+        ttl = settings.ha_mirror_shared_ttl
+        retired, self._retired = self._retired, set()
+        # Unchanged mirrors only need their expiry pushed back every third of the TTL
+        now = time.monotonic()
+        refresh_all = now - self._expiry_refreshed >= ttl / 3
+        if refresh_all:
+            self._expiry_refreshed = now
+
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for controller_id in retired:
+                pipe.delete(shared_mirror_key(controller_id, worker_id))
+                self._published.discard(controller_id)
+
+            for controller_id, stream in self.streams.items():
+                mirror = stream.mirror
+                key = shared_mirror_key(controller_id, worker_id)
+
+                if not mirror.ready:
+                    # Disconnected: stale states are worse than a REST fallback
+                    if controller_id in self._published:
+                        pipe.delete(key)
+                        self._published.discard(controller_id)
+                    mirror.needs_full_publish = True
+                    continue
+
+                if mirror.needs_full_publish:
+                    pipe.delete(key)
+                    changed = mirror.states.keys()
+                elif not mirror.dirty:
+                    if refresh_all:
+                        pipe.expire(key, ttl)
+                    continue
+                else:
+                    changed = mirror.dirty
+                    removed = [entity_id for entity_id in changed if entity_id not in mirror.states]
+                    if removed:
+                        pipe.hdel(key, *removed)
+
+                updates = {
+                    entity_id: json.dumps(mirror.states[entity_id])
+                    for entity_id in changed
+                    if entity_id in mirror.states
+                }
+                if updates:
+                    pipe.hset(key, mapping=updates)
+                pipe.expire(key, ttl)
+
+                mirror.dirty.clear()
+                mirror.needs_full_publish = False
+                self._published.add(controller_id)
+
+            await pipe.execute()
+
+    async def stop(self):
+        """Close every stream and remove this worker's shared mirrors."""
+        if self.publish_task:
+            self.publish_task.cancel()
+            self.publish_task = None
+
+        streams = list(self.streams.values())
+        self._retired.update(self.streams)
+        self.streams.clear()
+        for stream in streams:
+            stream.stop()
+        try:
+            await self.publish_mirrors()
+        except Exception as e:
+            logger.error(f"Error removing shared entity mirrors: {e}")
+        await asyncio.gather(
+            *(stream.task for stream in streams if stream.task), return_exceptions=True
+        )
+
+    def stats(self) -> dict:
+        return {
+            "streams": len(self.streams),
+            "live": sum(1 for stream in self.streams.values() if stream.live),
+            "ready": sum(1 for stream in self.streams.values() if stream.mirror.ready),
+            "shared": len(self._published),
+        }
+
+
+def publish_state_change(controller_id: str, entity_id: str, new_state: Optional[dict]):
+    """Gateway listener forwarding state changes to the owner's user:{id}:device:{id} channel."""
+    user_id = get_gateway().owner(controller_id)
+    if not user_id:
+        return
+
+    payload = {"device_id": controller_id, "entity_id": entity_id}
+    if new_state is None:
+        payload.update(state=None, attributes={})
+    else:
+        payload.update(state=new_state.get("state"), attributes=new_state.get("attributes", {}))
+
+    get_publisher().publish_nowait(
+        user_channel(user_id, f"device:{controller_id}"),
+        make_envelope("device.state_changed", payload),
+    )
+
+
+# Global gateway instance
+_gateway: HAGateway = None
+
+
+def get_gateway() -> HAGateway:
+    """Get the global Home Assistant gateway instance."""
+    global _gateway
+    if _gateway is None:
+        _gateway = HAGateway()
+    return _gateway
@@ -0,0 +1,138 @@
+import math
+from datetime import datetime
+from typing import Optional
+
+HISTORY_COLUMNS = ["time", "controller_id", "status", "rtt_ms", "span_seconds"]
+
+# Continuous aggregates over controller_heartbeats
+HISTORY_VIEWS = {
+    "1h": "controller_heartbeats_1h",
+    "1d": "controller_heartbeats_1d",
+}
+
+# rtt_histogram layout, matching migrations/008: equal buckets of ln(1 + rtt_ms)
+HISTOGRAM_MIN = 0.0
+HISTOGRAM_MAX = 10.0
+HISTOGRAM_BUCKETS = 50
+
+
+def histogram_percentile(counts: Optional[list[int]], pct: float) -> Optional[float]:
+    """
+    Approximate a latency percentile from an rtt_histogram.
+
+    The result is the upper edge of the bucket holding the percentile, so it
+    overestimates by at most one bucket width (about 22%).
+
+    Returns:
+        Latency in milliseconds, or None if the histogram is empty
+    """
+    if not counts:
+        return None
+
+    total = sum(counts)
+    if total == 0:
+        return None
+
+    width = (HISTOGRAM_MAX - HISTOGRAM_MIN) / HISTOGRAM_BUCKETS
+    rank = pct / 100 * total
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= rank and count:
+            # Index 0 is the underflow bucket, HISTOGRAM_BUCKETS + 1 the overflow
+            edge = HISTOGRAM_MIN + min(index, HISTOGRAM_BUCKETS) * width
+            return math.expm1(edge)
+    return math.expm1(HISTOGRAM_MAX)
+
+
+def merge_histograms(a: Optional[list[int]], b: Optional[list[int]]) -> Optional[list[int]]:
+    """Add two rtt_histograms bucket by bucket."""
+    if not a:
+        return list(b) if b else None
+    if not b:
+        return list(a)
+    return [x + y for x, y in zip(a, b)]
+
+
+class HistoryTotals:
+    """Running totals over any number of aggregate rows."""
+
+    def __init__(self):
+        self.probes = 0
+        self.observed_seconds = 0.0
+        self.online_seconds = 0.0
+        self.rtt_count = 0
+        self.rtt_sum = 0.0
+        self.rtt_max: Optional[float] = None
+        self.histogram: Optional[list[int]] = None
+
+    def add(self, row: dict):
+        self.probes += row["probes"]
+        self.observed_seconds += row["observed_seconds"] or 0.0
+        self.online_seconds += row["online_seconds"] or 0.0
+        self.rtt_count += row["rtt_count"]
+        self.rtt_sum += row["rtt_sum"] or 0.0
+        if row["rtt_max"] is not None:
+            self.rtt_max = max(self.rtt_max or 0.0, row["rtt_max"])
+        self.histogram = merge_histograms(self.histogram, row["rtt_histogram"])
+
+    def to_dict(self) -> dict:
+        return {
+            "probes": self.probes,
+            "uptime": (
+                self.online_seconds / self.observed_seconds if self.observed_seconds else None
+            ),
+            "avg_ms": self.rtt_sum / self.rtt_count if self.rtt_count else None,
+            "p50_ms": histogram_percentile(self.histogram, 50),
+            "p95_ms": histogram_percentile(self.histogram, 95),
+            "max_ms": self.rtt_max,
+        }
+
+
+async def fetch_history_rows(
+    conn, controller_ids: list, start: datetime, end: datetime, resolution: str
+) -> list[dict]:
+    """
+    Read aggregate rows for some controllers, oldest bucket first.
+
+    Raises:
+        ValueError: If the resolution has no continuous aggregate
+    """
+    view = HISTORY_VIEWS.get(resolution)
+    if view is None:
+        raise ValueError(
+            f"Invalid resolution '{resolution}'; use one of {', '.join(HISTORY_VIEWS)}"
+        )
+
+    rows = await conn.fetch(
+        f"""
+        SELECT bucket, controller_id, probes, observed_seconds, online_seconds,
+               rtt_count, rtt_sum, rtt_max, rtt_histogram
+        FROM {view}
+        WHERE controller_id = ANY($1::uuid[])
+          AND bucket >= $2 AND bucket < $3
+        ORDER BY bucket
+        """,
+        controller_ids,
+        start,
+        end,
+    )
+    return [dict(row) for row in rows]
+
+
+def history_points(rows: list[dict]) -> list[dict]:
+    """One point per bucket for a single controller's rows."""
+    points = []
+    for row in rows:
+        totals = HistoryTotals()
+        totals.add(row)
+        points.append({"time": row["bucket"], **totals.to_dict()})
+    return points
+
+
+def summarize_by_controller(rows: list[dict]) -> dict[str, dict]:
+    """Collapse rows into one summary per controller over the whole range."""
+    totals: dict[str, HistoryTotals] = {}
+    for row in rows:
+        totals.setdefault(str(row["controller_id"]), HistoryTotals()).add(row)
+    return {controller_id: total.to_dict() for controller_id, total in totals.items()}
@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import time
+import uuid
+
+from core.config import settings
+from db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+WORKERS_KEY = "heartbeat:workers"
+
+
+def _weight(worker_id: str, key: str) -> int:
+    digest = hashlib.blake2b(f"{worker_id}:{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def rendezvous_owner(workers: list[str], key: str) -> str | None:
+    """
+    Pick the worker that owns a key by rendezvous (highest random weight) hashing.
+
+    Every process computes the same owner from the same worker list, and when a
+    worker joins or leaves only the keys it gains or held change hands.
+    """
+    if not workers:
+        return None
+    return max(workers, key=lambda worker_id: _weight(worker_id, key))
+
+
+class WorkerLeases:
+    """
+    Tracks the live heartbeat workers across every API process.
+
+    Each worker keeps a lease in a Redis sorted set, scored by its expiry time,
+    and renews it every third of `lease_ttl`. Workers whose lease has expired
+    drop out of the live set, so their controllers move to the survivors
+    within one lease period; a clean shutdown removes the lease right away.
+    If Redis is unreachable the last known worker list is kept, and a worker
+    that has never seen the list owns everything.
+    """
+
+    def __init__(self, lease_ttl: int = None):
+        self.lease_ttl = lease_ttl or settings.heartbeat_lease_ttl
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.workers: list[str] = []
+        self.task: asyncio.Task = None
+
+    async def start(self):
+        """Register this worker and keep its lease renewed."""
+        if self.task:
+            return
+
+        await self.refresh()
+        self.task = asyncio.create_task(self._renew_loop())
+        logger.info(f"Heartbeat worker {self.worker_id} joined ({len(self.workers)} live)")
+
+    async def stop(self):
+        """Give up the lease so other workers take over immediately."""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        try:
+            await get_redis().zrem(WORKERS_KEY, self.worker_id)
+        except Exception as e:
+            logger.error(f"Error releasing heartbeat lease: {e}")
+
+    async def refresh(self) -> list[str]:
+        """Renew this worker's lease and reload the live worker list."""
+        now = time.time()
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.zadd(WORKERS_KEY, {self.worker_id: now + self.lease_ttl})
+                pipe.zremrangebyscore(WORKERS_KEY, "-inf", now)
+                pipe.zrange(WORKERS_KEY, 0, -1)
+                _, _, workers = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error renewing heartbeat lease: {e}")
+            return self.workers
+
+        workers = sorted(workers)
+        if workers != self.workers:
+            logger.info(f"Heartbeat workers changed: {len(self.workers)} -> {len(workers)}")
+        self.workers = workers
+        return workers
+
+    async def _renew_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            await self.refresh()
+
+    def owns(self, key) -> bool:
+        """Whether this worker is responsible for a key, e.g. a controller id."""
+        if not self.workers:
+            return True
+        return rendezvous_owner(self.workers, str(key)) == self.worker_id
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "workers": len(self.workers),
+            "lease_ttl": self.lease_ttl,
+        }
+
+
+# Global worker leases instance
+_worker_leases: WorkerLeases = None
+
+
+def get_worker_leases() -> WorkerLeases:
+    """Get the global worker leases instance."""
+    global _worker_leases
+    if _worker_leases is None:
+        _worker_leases = WorkerLeases()
+    return _worker_leases
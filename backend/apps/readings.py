@@ -0,0 +1,156 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from core.config import settings
+
+# Continuous aggregates over sensor_readings, coarsest first
+AGGREGATE_VIEWS = [
+    (86400, "sensor_readings_1d"),
+    (3600, "sensor_readings_1h"),
+    (300, "sensor_readings_5m"),
+    (60, "sensor_readings_1m"),
+]
+
+# How each aggregation is computed from a continuous aggregate's partial columns
+AGGREGATE_EXPRESSIONS = {
+    "avg": "sum(value_sum) / NULLIF(sum(value_count), 0)",
+    "min": "min(value_min)",
+    "max": "max(value_max)",
+    "sum": "sum(value_sum)",
+    "count": "sum(samples)",
+}
+
+# ...and from raw readings
+RAW_EXPRESSIONS = {
+    "avg": "avg(sensor_state_numeric(state))",
+    "min": "min(sensor_state_numeric(state))",
+    "max": "max(sensor_state_numeric(state))",
+    "sum": "sum(sensor_state_numeric(state))",
+    "count": "count(*)",
+}
+
+UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_resolution(resolution: str) -> Optional[int]:
+    """
+    Parse a resolution like "raw", "1m", "15m", "1h" or "1d".
+
+    Returns:
+        Bucket width in seconds, or None for raw readings
+
+    Raises:
+        ValueError: If the resolution is not recognised
+    """
+    if resolution == "raw":
+        return None
+
+    match = re.fullmatch(r"(\d+)([mhd])", resolution)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid resolution '{resolution}'")
+
+    return int(match.group(1)) * UNIT_SECONDS[match.group(2)]
+
+
+def choose_source(bucket_seconds: int) -> tuple[str, str, str]:
+    """
+    Pick the coarsest relation that can answer a bucket width.
+
+    A continuous aggregate can serve any resolution that is a whole multiple of
+    its own bucket; otherwise the raw hypertable is used.
+
+    Returns:
+        Tuple of (relation, time_column, source_label)
+    """
+    for view_seconds, view in AGGREGATE_VIEWS:
+        if bucket_seconds % view_seconds == 0:
+            return view, "bucket", view
+    return "sensor_readings", "time", "raw"
+
+
+def build_readings_query(resolution: str, aggregation: str) -> tuple[str, str]:
+    """
+    Build the SQL for a readings request.
+
+    Parameters are $1 controller_id, $2 entity_id, $3 start, $4 end and,
+    for raw readings, $5 row limit.
+
+    Returns:
+        Tuple of (sql, source_label)
+    """
+    bucket_seconds = parse_resolution(resolution)
+
+    if bucket_seconds is None:
+        sql = """
+            SELECT time, state, sensor_state_numeric(state) AS value
+            FROM sensor_readings
+            WHERE controller_id = $1 AND entity_id = $2
+              AND time >= $3 AND time < $4
+            ORDER BY time
+            LIMIT $5
+        """
+        return sql, "raw"
+
+    if aggregation not in AGGREGATE_EXPRESSIONS:
+        raise ValueError(f"Invalid aggregation '{aggregation}'")
+
+    relation, time_column, source = choose_source(bucket_seconds)
+    expressions = AGGREGATE_EXPRESSIONS if source != "raw" else RAW_EXPRESSIONS
+
+    sql = f"""
+        SELECT time_bucket(INTERVAL '{bucket_seconds} seconds', {time_column}) AS time,
+               {expressions[aggregation]} AS value
+        FROM {relation}
+        WHERE controller_id = $1 AND entity_id = $2
+          AND {time_column} >= $3 AND {time_column} < $4
+        GROUP BY 1
+        ORDER BY 1
+    """
+    return sql, source
+
+
+def default_range(
+    start: Optional[datetime], end: Optional[datetime]
+) -> tuple[datetime, datetime]:
+    """
+    Fill in a missing range end with now and a missing start with 24 hours before end.
+    Naive timestamps are taken as UTC.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=24)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return start, end
+
+
+def count_points(start: datetime, end: datetime, resolution: str) -> Optional[int]:
+    """Number of buckets a request would return, or None for raw readings."""
+    bucket_seconds = parse_resolution(resolution)
+    if bucket_seconds is None:
+        return None
+    return int((end - start).total_seconds() // bucket_seconds) + 1
+
+
+async def fetch_readings(
+    conn, controller_id, entity_id: str, start: datetime, end: datetime,
+    resolution: str, aggregation: str,
+) -> tuple[list[dict], str]:
+    """
+    Run a readings query.
+
+    Returns:
+        Tuple of (points, source_label)
+    """
+    sql, source = build_readings_query(resolution, aggregation)
+
+    if parse_resolution(resolution) is None:
+        rows = await conn.fetch(
+            sql, controller_id, entity_id, start, end, settings.readings_raw_limit
+        )
+        return [dict(row) for row in rows], source
+
+    rows = await conn.fetch(sql, controller_id, entity_id, start, end)
+    return [dict(row) for row in rows], source
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+
+from fastapi import WebSocket
+
+from core.config import settings
+from db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Subscribed at startup so the shared pub/sub connection always has a channel
+CONTROL_CHANNEL = "realtime:control"
+
+
+def make_envelope(message_type: str, payload: dict) -> str:
+    """Serialize a message in the standard WebSocket envelope."""
+    return json.dumps(
+        {
+            "type": message_type,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "payload": payload,
+        },
+        default=str,
+    )
+
+
+def user_channel(user_id, topic: str) -> str:
+    """Build a per-user channel name, e.g. user:{id}:devices."""
+    return f"user:{user_id}:{topic}"
+
+
+class ClientConnection:
+    """A connected browser socket with its own bounded send queue."""
+
+    def __init__(self, websocket: WebSocket, user_id: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.channels: set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ws_send_queue_size)
+        self.task: asyncio.Task = None
+        self.closed = False
+
+    def enqueue(self, text: str) -> bool:
+        """Queue a message without blocking. Returns False if the client is too slow."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _sender(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket went away; the endpoint's receive loop cleans up
+            self.closed = True
+
+
+class RealtimeHub:
+    """
+    Fans Redis pub/sub messages out to this process's WebSocket clients.
+
+    The process holds a single Redis pub/sub connection. A Redis channel is
+    subscribed when its first local client subscribes and unsubscribed when the
+    last one leaves, so Redis sees one subscriber per worker rather than one
+    per browser. Each message is forwarded as-is to every local subscriber's
+    send queue; clients whose queue is full are disconnected.
+    """
+
+    def __init__(self):
+        self.pubsub = None
+        self.task: asyncio.Task = None
+        self.subscribers: dict[str, set[ClientConnection]] = {}
+        self.connections: set[ClientConnection] = set()
+        self._lock = asyncio.Lock()
+        self.delivered = 0
+        self.slow_disconnects = 0
+
+    async def start(self):
+        """Open the shared pub/sub connection and start the reader task."""
+        if self.task:
+            return
+
+        self.pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(CONTROL_CHANNEL)
+        self.task = asyncio.create_task(self._reader_loop())
+        logger.info("Realtime hub started")
+
+    async def stop(self):
+        """Close every client and the pub/sub connection."""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        for connection in list(self.connections):
+            await self._close(connection, code=1001)
+
+        if self.pubsub:
+            await self.pubsub.reset()
+            self.pubsub = None
+        logger.info("Realtime hub stopped")
+
+    async def connect(self, websocket: WebSocket, user_id: str) -> ClientConnection:
+        """Register an accepted socket and start its sender."""
+        connection = ClientConnection(websocket, str(user_id))
+        connection.task = asyncio.create_task(connection._sender())
+        self.connections.add(connection)
+        return connection
+
+    async def disconnect(self, connection: ClientConnection):
+        """Drop a socket and release its channels."""
+        connection.closed = True
+        self.connections.discard(connection)
+        if connection.task:
+            connection.task.cancel()
+
+        for channel in list(connection.channels):
+            await self.unsubscribe(connection, channel)
+
+    def can_subscribe(self, connection: ClientConnection, channel: str) -> bool:
+        """Clients may only subscribe to their own user:{id}:* channels."""
+        return channel.startswith(user_channel(connection.user_id, ""))
+
+    async def subscribe(self, connection: ClientConnection, channel: str):
+        if channel in connection.channels:
+            return
+
+        connection.channels.add(channel)
+        async with self._lock:
+            local = self.subscribers.setdefault(channel, set())
+            local.add(connection)
+            if len(local) == 1:
+                await self.pubsub.subscribe(channel)
+
+    async def unsubscribe(self, connection: ClientConnection, channel: str):
+        if channel not in connection.channels:
+            return
+
+        connection.channels.discard(channel)
+        async with self._lock:
+            local = self.subscribers.get(channel)
+            if local is None:
+                return
+            local.discard(connection)
+            if not local:
+                del self.subscribers[channel]
+                if self.pubsub:
+                    await self.pubsub.unsubscribe(channel)
+
+    async def _reader_loop(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Realtime hub read error: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            if message is None or message.get("type") != "message":
+                continue
+
+            channel = message["channel"]
+            for connection in list(self.subscribers.get(channel, ())):
+                if connection.closed:
+                    continue
+                if connection.enqueue(message["data"]):
+                    self.delivered += 1
+                else:
+                    # Too slow to keep up: drop it rather than buffer without bound
+                    connection.closed = True
+                    self.slow_disconnects += 1
+                    asyncio.create_task(self._close(connection, code=1013))
+
+    async def _close(self, connection: ClientConnection, code: int):
+        await self.disconnect(connection)
+        try:
+            await connection.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.connections),
+            "channels": len(self.subscribers),
+            "delivered": self.delivered,
+            "slow_disconnects": self.slow_disconnects,
+        }
+
+
+class RealtimePublisher:
+    """
+    Non-blocking publisher for high-rate events.
+
+    publish_nowait() can be called from synchronous callbacks; messages are
+    queued and sent to Redis in pipelined batches by a background task.
+    """
+
+    def __init__(self, queue_size: int = None):
+        self.queue: asyncio.Queue = asyncio.Queue(
+            maxsize=queue_size or settings.realtime_publish_queue_size
+        )
+        self.task: asyncio.Task = None
+        self.dropped = 0
+
+    def publish_nowait(self, channel: str, text: str) -> bool:
+        try:
+            self.queue.put_nowait((channel, text))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._publish_loop())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _publish_loop(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                async with get_redis().pipeline(transaction=False) as pipe:
+                    for channel, text in batch:
+                        pipe.publish(channel, text)
+                    await pipe.execute()
+            except Exception as e:
+                logger.error(f"Error publishing {len(batch)} realtime messages: {e}")
+
+
+# Global realtime instances
+_hub: RealtimeHub = None
+_publisher: RealtimePublisher = None
+
+
+def get_hub() -> RealtimeHub:
+    """Get the global realtime hub instance."""
+    global _hub
+    if _hub is None:
+        _hub = RealtimeHub()
+    return _hub
+
+
+def get_publisher() -> RealtimePublisher:
+    """Get the global realtime publisher instance."""
+    global _publisher
+    if _publisher is None:
+        _publisher = RealtimePublisher()
+    return _publisher
@@ -0,0 +1,104 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from typing import Optional
+
+from apps.singleflight import SingleFlight
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HostResolver:
+    """
+    Asynchronous hostname resolver with a TTL cache.
+
+    Lookups go through the system resolver (so .local mDNS names resolve the
+    same way socket.gethostbyname() does) but run in the default executor,
+    so a slow lookup never blocks the event loop. Successful lookups are
+    cached for `ttl` seconds and failures for `negative_ttl` seconds, and
+    concurrent lookups of the same host share one call.
+    """
+
+    def __init__(self, ttl: int = None, negative_ttl: int = None, timeout: float = None):
+        self.ttl = ttl or settings.dns_cache_ttl
+        self.negative_ttl = negative_ttl or settings.dns_negative_ttl
+        self.timeout = timeout or settings.dns_timeout
+        self._cache: dict[str, tuple[float, Optional[str]]] = {}
+        self._lookups = SingleFlight(distributed=False)
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    async def resolve(self, hostname: str) -> Optional[str]:
+        """
+        Resolve a hostname to an IPv4 address.
+
+        Returns:
+            The address, or None if the host cannot be resolved
+        """
+        if _is_ip(hostname):
+            return hostname
+
+        entry = self._cache.get(hostname)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        return await self._lookups.do(hostname, lambda: self._lookup(hostname))
+
+    async def _lookup(self, hostname: str) -> Optional[str]:
+        try:
+            infos = await asyncio.wait_for(
+                asyncio.get_running_loop().getaddrinfo(
+                    hostname, None, family=socket.AF_INET, type=socket.SOCK_STREAM
+                ),
+                timeout=self.timeout,
+            )
+            ip = infos[0][4][0]
+        except (OSError, asyncio.TimeoutError, IndexError) as e:
+            logger.debug(f"Could not resolve {hostname}: {e}")
+            self.failures += 1
+            self._cache[hostname] = (time.monotonic() + self.negative_ttl, None)
+            return None
+
+        self._cache[hostname] = (time.monotonic() + self.ttl, ip)
+        return ip
+
+    def forget(self, hostname: str):
+        """Drop a cached lookup, e.g. after the address stopped answering."""
+        self._cache.pop(hostname, None)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        live = [ip for expires_at, ip in self._cache.values() if expires_at > now]
+        return {
+            "cached": sum(1 for ip in live if ip is not None),
+            "negative": sum(1 for ip in live if ip is None),
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+        }
+
+
+def _is_ip(hostname: str) -> bool:
+    try:
+        ipaddress.ip_address(hostname)
+        return True
+    except ValueError:
+        return False
+
+
+# Global resolver instance
+_resolver: HostResolver = None
+
+
+def get_resolver() -> HostResolver:
+    """Get the global host resolver instance."""
+    global _resolver
+    if _resolver is None:
+        _resolver = HostResolver()
+    return _resolver
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from core.config import settings
+from db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one in-flight call.
+
+    Callers that ask for a key while a call for it is already running wait for
+    that call's result instead of starting their own. With `distributed` enabled,
+    a short Redis lock extends this across worker processes: the lock holder
+    makes the upstream call and publishes the result for the others to read.
+    Results shared across workers must be JSON-serializable.
+    """
+
+    def __init__(self, distributed: bool = None):
+        self.distributed = (
+            settings.ha_singleflight_distributed if distributed is None else distributed
+        )
+        self._calls: dict[str, asyncio.Future] = {}
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+        self.remote_coalesced_calls = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key, or join the call already in flight for key."""
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced_calls += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leading call was cancelled, not us: start a fresh one
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    return await self.do(key, fn)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+
+        try:
+            result = await self._call(key, fn)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters (if any) re-raise it; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    async def _call(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.distributed:
+            self.upstream_calls += 1
+            return await fn()
+
+        try:
+            redis = get_redis()
+            lock = redis.lock(f"sf:lock:{key}", timeout=settings.ha_singleflight_lock_timeout)
+            acquired = await lock.acquire(blocking=False)
+        except Exception as e:
+            logger.error(f"Single-flight lock unavailable, calling upstream: {e}")
+            self.upstream_calls += 1
+            return await fn()
+
+        result_key = f"sf:result:{key}"
+
+        if acquired:
+            try:
+                self.upstream_calls += 1
+                result = await fn()
+                try:
+                    await redis.set(
+                        result_key,
+                        json.dumps(result),
+                        px=int(settings.ha_singleflight_result_ttl * 1000),
+                    )
+                except Exception as e:
+                    logger.error(f"Error publishing single-flight result: {e}")
+                return result
+            finally:
+                try:
+                    await lock.release()
+                except Exception:
+                    pass
+
+        # Another worker holds the lock: wait for its result
+        deadline = time.monotonic() + settings.ha_singleflight_lock_timeout
+        while time.monotonic() < deadline:
+            try:
+                holder_done = not await lock.locked()
+                cached = await redis.get(result_key)
+            except Exception:
+                break
+            if cached is not None:
+                self.remote_coalesced_calls += 1
+                return json.loads(cached)
+            if holder_done:
+                break
+            await asyncio.sleep(0.05)
+
+        self.upstream_calls += 1
+        return await fn()
+
+    def stats(self) -> dict:
+        return {
+            "distributed": self.distributed,
+            "in_flight": len(self._calls),
+            "upstream_calls": self.upstream_calls,
+            "coalesced_calls": self.coalesced_calls,
+            "remote_coalesced_calls": self.remote_coalesced_calls,
+        }
+
+
+# Global single-flight instance for Home Assistant fetches
+_single_flight: SingleFlight = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Get the global single-flight instance."""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+
+import asyncpg
+
+from apps.batching import BatchWriter
+from core.config import settings
+from db.postgres import get_pool
+
+logger = logging.getLogger(__name__)
+
+READING_COLUMNS = ["time", "controller_id", "entity_id", "state", "attributes", "ingested_at"]
+
+
+class TelemetryIngestor(BatchWriter):
+    """
+    Buffers entity state changes and writes them to sensor_readings with COPY.
+
+    submit() never blocks: readings go into a bounded queue and are dropped
+    (and counted) when it is full. A background task drains the queue in
+    batches, flushing when `batch_size` readings are buffered or
+    `flush_interval` seconds have passed since the first one, whichever is first.
+    """
+
+    def __init__(
+        self, queue_size: int = None, batch_size: int = None, flush_interval: float = None
+    ):
+        super().__init__(
+            queue_size or settings.telemetry_queue_size,
+            batch_size or settings.telemetry_batch_size,
+            flush_interval or settings.telemetry_flush_interval,
+        )
+
+        # Backpressure / throughput counters
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.orphaned = 0  # Readings for controllers deleted before they were written
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_flush_seconds = 0.0
+        self.high_water = 0
+
+    def submit(self, controller_id, entity_id: str, new_state: Optional[dict]) -> bool:
+        """
+        Queue one state change for ingestion.
+
+        Returns:
+            False if the reading was dropped because the queue is full
+        """
+        if new_state is None:
+            return True
+
+        record = (
+            _parse_time(new_state.get("last_updated")),
+            UUID(str(controller_id)),
+            entity_id,
+            _truncate(new_state.get("state")),
+            json.dumps(new_state.get("attributes") or {}),
+            datetime.now(timezone.utc),
+        )
+
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+        self.submitted += 1
+        self.high_water = max(self.high_water, self.queue.qsize())
+        return True
+
+    async def start(self):
+        """Start the background writer task."""
+        if self.running:
+            return
+
+        await super().start()
+        logger.info("Telemetry ingestor started")
+
+    async def stop(self):
+        """Stop accepting batches and flush whatever is still queued."""
+        await super().stop()
+        logger.info("Telemetry ingestor stopped")
+
+    async def _flush(self, batch: list[tuple]):
+        if not batch:
+            return
+
+        started = time.monotonic()
+        try:
+            async with get_pool().acquire() as conn:
+                orphaned = await copy_controller_rows(
+                    conn, "sensor_readings", batch, READING_COLUMNS
+                )
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Error writing {len(batch)} sensor readings: {e}")
+            return
+
+        self.orphaned += orphaned
+        self.written += len(batch) - orphaned
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.last_flush_seconds = time.monotonic() - started
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue_size,
+            "queue_high_water": self.high_water,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "orphaned": self.orphaned,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+async def copy_controller_rows(conn, table: str, records: list[tuple], columns: list[str]) -> int:
+    """
+    COPY rows whose second column is a controller id into a table.
+
+    COPY is all-or-nothing, so a single row for a controller deleted since
+    it was queued would fail the whole batch on the foreign key. When that
+    happens the rows for missing controllers are dropped and the COPY is
+    retried once.
+
+    Returns:
+        Number of rows dropped because their controller no longer exists
+    """
+    try:
+        await conn.copy_records_to_table(table, records=records, columns=columns)
+        return 0
+    except asyncpg.ForeignKeyViolationError:
+        pass
+
+    rows = await conn.fetch(
+        "SELECT id FROM master_controllers WHERE id = ANY($1::uuid[])",
+        list({record[1] for record in records}),
+    )
+    known = {str(row["id"]) for row in rows}
+    kept = [record for record in records if str(record[1]) in known]
+    if kept:
+        await conn.copy_records_to_table(table, records=kept, columns=columns)
+    return len(records) - len(kept)
+
+
+def _parse_time(value: Optional[str]) -> datetime:
+    if value:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.now(timezone.utc)
+
+
+def _truncate(state) -> Optional[str]:
+    if state is None:
+        return None
+    return str(state)[:255]
+
+
+# Global ingestor instance
+_ingestor: TelemetryIngestor = None
+
+
+def get_ingestor() -> TelemetryIngestor:
+    """Get the global telemetry ingestor instance."""
+    global _ingestor
+    if _ingestor is None:
+        _ingestor = TelemetryIngestor()
+    return _ingestor
@@ -0,0 +1,108 @@
+"""
+Login hashing benchmark.
+
+Simulates concurrent logins verifying Argon2 hashes, once inline on the event
+loop (the old behaviour) and once through the HashingPool, and reports login
+throughput, rejections and event loop lag.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_hashing --logins 200 --concurrency 50
+
+Argon2 parameters come from the usual settings, e.g. QC_ARGON2_MEMORY_COST.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from core.config import settings
+from core.security import HashingBusyError, HashingPool, hash_password, verify_password
+
+PASSWORD = "correct horse battery staple"
+
+
+async def measure_lag(samples: list[float], stop: asyncio.Event, interval: float = 0.005):
+    """Record how late the loop wakes up from a short sleep, in milliseconds."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - started - interval) * 1000)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(mode: str, password_hash: str, args) -> dict:
+    pool = HashingPool(workers=args.workers, max_pending=args.max_pending)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    lag: list[float] = []
+    stop = asyncio.Event()
+    ok = 0
+    rejected = 0
+
+    async def login():
+        nonlocal ok, rejected
+        async with semaphore:
+            if mode == "inline":
+                verify_password(PASSWORD, password_hash)
+                ok += 1
+                return
+            try:
+                await pool.verify(PASSWORD, password_hash)
+                ok += 1
+            except HashingBusyError:
+                rejected += 1
+
+    lag_task = asyncio.create_task(measure_lag(lag, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+    pool.close()
+
+    return {
+        "mode": mode,
+        "logins_per_second": ok / elapsed if elapsed else 0.0,
+        "ok": ok,
+        "rejected": rejected,
+        "lag_p50_ms": statistics.median(lag) if lag else 0.0,
+        "lag_p99_ms": percentile(lag, 99),
+        "lag_max_ms": max(lag, default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=settings.password_hash_workers)
+    parser.add_argument("--max-pending", type=int, default=settings.password_hash_max_pending)
+    args = parser.parse_args()
+
+    print(
+        f"argon2 time_cost={settings.argon2_time_cost} memory_cost={settings.argon2_memory_cost} "
+        f"parallelism={settings.argon2_parallelism}; workers={args.workers} "
+        f"max_pending={args.max_pending}"
+    )
+
+    password_hash = hash_password(PASSWORD)
+    for mode in ("inline", "pool"):
+        result = asyncio.run(run(mode, password_hash, args))
+        print(
+            f"{result['mode']:>6}: {result['logins_per_second']:8.1f} logins/s  "
+            f"ok={result['ok']} rejected={result['rejected']}  "
+            f"loop lag p50={result['lag_p50_ms']:.1f}ms p99={result['lag_p99_ms']:.1f}ms "
+            f"max={result['lag_max_ms']:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,95 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 15
     refresh_token_expire_days: int = 7
     token_encryption_key: str = "change-this-to-a-fernet-key"  # Generate with Fernet.generate_key()
+    token_encryption_old_keys: str = ""  # Comma-separated keys still accepted for decryption
+
+    # Password hashing (argon2id)
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536  # KiB
+    argon2_parallelism: int = 4
+    password_hash_workers: int = 4  # Threads dedicated to hashing
+    password_hash_max_pending: int = 32  # Running + queued hashes before requests get 503
+
+    # In-process caches
+    user_cache_size: int = 10_000
+    user_cache_ttl: int = 60
+    permission_cache_size: int = 10_000
+    permission_cache_ttl: int = 300
+    token_cache_size: int = 10_000
+    token_cache_ttl: int = 300
+
+    # Connection manager
+    heartbeat_interval: int = 30
+    heartbeat_concurrency: int = 50  # Max controllers checked at the same time
+    heartbeat_jitter: float = 0.5  # Fraction of the interval checks are spread across
+    heartbeat_check_timeout: float = 15.0
+    heartbeat_last_seen_resolution: int = 300  # Min seconds between last_seen writes
+    heartbeat_lease_ttl: int = 15  # Seconds before a silent worker's controllers move
+    heartbeat_flap_interval: int = 10  # Re-check delay right after a status change
+    heartbeat_flap_probes: int = 3  # Fast re-checks after a status change
+    heartbeat_max_backoff: int = 600  # Cap on the exponential backoff for failing controllers
+    heartbeat_breaker_threshold: int = 5  # Consecutive failures before the circuit breaker opens
+    heartbeat_breaker_cooldown: int = 1800  # Probe interval while the breaker is open
+    heartbeat_version_refresh: int = 21600  # Re-read the HA version this often while online
+    heartbeat_ping_timeout: float = 2.0  # WebSocket ping budget before falling back to REST
+    heartbeat_result_flush_window: float = 1.0  # Finished checks are written back together
+    heartbeat_history_enabled: bool = True  # Record every probe in controller_heartbeats
+    heartbeat_history_batch_size: int = 1_000
+    heartbeat_history_flush_interval: float = 10.0
+
+    # Home Assistant HTTP client pool
+    ha_http_max_connections: int = 10
+    ha_http_max_keepalive: int = 5
+    ha_http_keepalive_expiry: float = 60.0
+    ha_http_idle_timeout: int = 300  # Close pooled clients unused for this long
+    ha_http2: bool = False  # Requires the optional "http2" extra
+
+    # Controller hostname resolution
+    dns_cache_ttl: int = 300
+    dns_negative_ttl: int = 30  # Failed lookups are retried after this long
+    dns_timeout: float = 5.0
+
+    # Single-flight coalescing of Home Assistant fetches
+    ha_singleflight_distributed: bool = False  # Coalesce across workers through Redis
+    ha_singleflight_lock_timeout: float = 15.0
+    ha_singleflight_result_ttl: float = 1.0
+
+    # Home Assistant WebSocket gateway
+    ha_ws_max_message_size: int = 64 * 1024 * 1024  # get_states snapshots can be large
+    ha_ws_max_backoff: int = 60
+    ha_mirror_publish_interval: float = 1.0  # How often owners copy mirror changes to Redis
+    ha_mirror_shared_ttl: int = 30  # Shared mirrors of a worker that stops publishing expire
+
+    # Entity listing cache
+    entity_cache_ttl: int = 5
+
+    # Command Center system stats cache
+    system_stats_cache_ttl: int = 10
+
+    # Telemetry ingestion
+    telemetry_enabled: bool = True
+    telemetry_queue_size: int = 100_000  # Readings beyond this are dropped and counted
+    telemetry_batch_size: int = 5_000
+    telemetry_flush_interval: float = 1.0
+
+    # Time-series queries
+    readings_raw_limit: int = 10_000
+    readings_max_points: int = 10_000
+
+    # Audit log writer
+    audit_queue_size: int = 10_000
+    audit_batch_size: int = 500
+    audit_flush_interval: float = 2.0
+    # Events are kept here while Postgres is down
+    audit_spill_dir: str = "/tmp/quickcontroller/audit-spill"
+    audit_export_chunk_rows: int = 1_000  # Rows fetched and sent per chunk of an export
+    audit_chunk_interval_days: int = 7  # Applies to chunks created from now on
+    audit_compress_after_days: int = 30  # 0 disables compression
+    audit_retention_days: int = 365  # 0 keeps audit logs forever
+
+    # Realtime WebSocket fan-out
+    ws_send_queue_size: int = 256  # Per-socket buffer before a slow client is dropped
+    realtime_publish_queue_size: int = 50_000
 
     # API
     api_host: str = "0.0.0.0"
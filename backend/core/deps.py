@@ -1,16 +1,71 @@
+import asyncpg
 from fastapi import Cookie, Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from core.cache import TTLCache
+from core.config import settings
+from core.invalidation import get_invalidation_bus
 from core.security import decode_token
 from db.postgres import get_pool
 
 security = HTTPBearer()
 
+# Users resolved from access tokens, keyed by user id
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+get_invalidation_bus().register("user", user_cache.delete)
+
+
+async def invalidate_user(user_id) -> None:
+    """Evict a user from every worker's cache. Call after changing or deleting a user."""
+    await get_invalidation_bus().publish("user", str(user_id))
+
+
+class RequestConnection:
+    """
+    A pool connection shared by every dependency and the handler of one request.
+
+    The connection is only checked out on first use, so requests served
+    entirely from caches never touch the pool. Handlers that go on to make
+    slow upstream calls should release() it first.
+    """
+
+    def __init__(self):
+        self._conn: asyncpg.Connection = None
+
+    async def acquire(self) -> asyncpg.Connection:
+        if self._conn is None:
+            self._conn = await get_pool().acquire()
+        return self._conn
+
+    async def release(self) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await get_pool().release(conn)
+
+
+async def get_db():
+    """Request-scoped database connection dependency."""
+    db = RequestConnection()
+    try:
+        yield db
+    finally:
+        await db.release()
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: RequestConnection = Depends(get_db),
 ):
-    token = credentials.credentials
+    return await get_user_from_token(credentials.credentials, db)
+
+
+def user_id_from_token(token: str) -> str:
+    """
+    Validate an access token and return its user id.
+
+    Raises:
+        HTTPException: 401 if the token is invalid or expired
+    """
     payload = decode_token(token)
 
     if not payload or payload.get("type") != "access":
@@ -26,8 +81,31 @@ async def get_current_user(
             detail="Invalid token payload",
         )
 
-    async with get_pool().acquire() as conn:
+    return user_id
+
+
+async def get_user_from_token(token: str, db: RequestConnection = None) -> dict:
+    """
+    Validate an access token and load its user.
+
+    Shared by the bearer-token dependency and the WebSocket endpoint,
+    which receives its token in the query string.
+
+    Raises:
+        HTTPException: 401 if the token is invalid or the user no longer exists
+    """
+    user_id = user_id_from_token(token)
+
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return dict(cached)
+
+    if db is not None:
+        conn = await db.acquire()
         user = await conn.fetchrow("SELECT id, email FROM users WHERE id = $1", user_id)
+    else:
+        async with get_pool().acquire() as conn:
+            user = await conn.fetchrow("SELECT id, email FROM users WHERE id = $1", user_id)
 
     if not user:
         raise HTTPException(
@@ -35,6 +113,7 @@ async def get_current_user(
             detail="User not found",
         )
 
+    user_cache.set(user_id, dict(user))
     return dict(user)
 
 
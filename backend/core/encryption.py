@@ -1,11 +1,37 @@
-from cryptography.fernet import Fernet
+import hashlib
 
+from cryptography.fernet import Fernet, MultiFernet
+
+from core.cache import TTLCache
 from core.config import settings
+from core.invalidation import get_invalidation_bus
+
+# Decrypted controller tokens, keyed by a hash of their ciphertext
+token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=settings.token_cache_ttl)
+get_invalidation_bus().register("token", token_cache.delete)
+
+_cipher: MultiFernet = None
+
+
+def get_cipher() -> MultiFernet:
+    """
+    Get the shared cipher for the configured encryption keys.
 
+    Tokens are encrypted with token_encryption_key. Keys listed in
+    token_encryption_old_keys can still decrypt, so the primary key can be
+    rotated without re-encrypting every stored token first.
+    """
+    global _cipher
+    if _cipher is None:
+        keys = [settings.token_encryption_key] + [
+            key.strip() for key in settings.token_encryption_old_keys.split(",") if key.strip()
+        ]
+        _cipher = MultiFernet([Fernet(key.encode()) for key in keys])
+    return _cipher
 
-def get_cipher() -> Fernet:
-    """Get Fernet cipher instance using the configured encryption key."""
-    return Fernet(settings.token_encryption_key.encode())
+
+def _cache_key(ciphertext: str) -> str:
+    return hashlib.sha256(ciphertext.encode()).hexdigest()
 
 
 def encrypt_token(plaintext: str) -> str:
@@ -17,6 +43,22 @@ def encrypt_token(plaintext: str) -> str:
 
 def decrypt_token(ciphertext: str) -> str:
     """Decrypt a token using Fernet symmetric encryption."""
+    key = _cache_key(ciphertext)
+    plaintext = token_cache.get(key)
+    if plaintext is not None:
+        return plaintext
+
     cipher = get_cipher()
     decrypted_bytes = cipher.decrypt(ciphertext.encode())
-    return decrypted_bytes.decode()
+    plaintext = decrypted_bytes.decode()
+    token_cache.set(key, plaintext)
+    return plaintext
+
+
+async def evict_token(ciphertext: str) -> None:
+    """
+    Drop a decrypted token from every worker's cache.
+
+    Call when a controller's token changes or the controller is deleted.
+    """
+    await get_invalidation_bus().publish("token", _cache_key(ciphertext))
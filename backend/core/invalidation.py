@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+from typing import Callable
+
+from db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache_invalidation"
+
+
+class InvalidationBus:
+    """
+    Propagates cache invalidations to every worker over Redis pub/sub.
+
+    Handlers are registered per kind (e.g. "user") and called with the
+    invalidated key in every process, including the one that published it.
+    """
+
+    def __init__(self):
+        self.handlers: dict[str, list[Callable[[str], None]]] = {}
+        self.pubsub = None
+        self.task: asyncio.Task = None
+
+    def register(self, kind: str, handler: Callable[[str], None]):
+        self.handlers.setdefault(kind, []).append(handler)
+
+    async def start(self):
+        """Subscribe to the invalidation channel and start dispatching."""
+        if self.task:
+            return
+
+        self.pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(INVALIDATION_CHANNEL)
+        self.task = asyncio.create_task(self._reader_loop())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        if self.pubsub:
+            await self.pubsub.reset()
+            self.pubsub = None
+
+    async def publish(self, kind: str, key: str):
+        """Invalidate locally right away, then tell the other workers."""
+        self._dispatch(kind, key)
+        try:
+            await get_redis().publish(
+                INVALIDATION_CHANNEL, json.dumps({"kind": kind, "key": key})
+            )
+        except Exception as e:
+            logger.error(f"Error publishing {kind} invalidation: {e}")
+
+    def _dispatch(self, kind: str, key: str):
+        for handler in self.handlers.get(kind, ()):
+            try:
+                handler(key)
+            except Exception as e:
+                logger.error(f"Error in {kind} invalidation handler: {e}")
+
+    async def _reader_loop(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Invalidation bus read error: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            if message is None or message.get("type") != "message":
+                continue
+
+            try:
+                data = json.loads(message["data"])
+                self._dispatch(data["kind"], data["key"])
+            except (ValueError, KeyError) as e:
+                logger.error(f"Malformed invalidation message: {e}")
+
+
+# Global invalidation bus instance
+_bus: InvalidationBus = None
+
+
+def get_invalidation_bus() -> InvalidationBus:
+    """Get the global invalidation bus instance."""
+    global _bus
+    if _bus is None:
+        _bus = InvalidationBus()
+    return _bus
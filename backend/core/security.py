@@ -1,12 +1,21 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import Callable, TypeVar
 
 from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
+from argon2.exceptions import InvalidHashError, VerifyMismatchError
 from jose import JWTError, jwt
 
 from core.config import settings
 
-ph = PasswordHasher()
+T = TypeVar("T")
+
+ph = PasswordHasher(
+    time_cost=settings.argon2_time_cost,
+    memory_cost=settings.argon2_memory_cost,
+    parallelism=settings.argon2_parallelism,
+)
 
 
 def hash_password(password: str) -> str:
@@ -17,10 +26,75 @@ def verify_password(password: str, password_hash: str) -> bool:
     try:
         ph.verify(password_hash, password)
         return True
-    except VerifyMismatchError:
+    except (VerifyMismatchError, InvalidHashError):
         return False
 
 
+def needs_rehash(password_hash: str) -> bool:
+    """Whether a hash was made with different Argon2 parameters than the current ones."""
+    return ph.check_needs_rehash(password_hash)
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing pool already has its maximum of pending hashes."""
+
+
+class HashingPool:
+    """
+    Runs Argon2 on dedicated threads so it never blocks the event loop.
+
+    argon2-cffi releases the GIL while hashing, so a small thread pool hashes
+    in parallel. At most `max_pending` hashes may be running or queued; past
+    that, calls fail immediately with HashingBusyError instead of piling up.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None):
+        self.workers = workers or settings.password_hash_workers
+        self.max_pending = max_pending or settings.password_hash_max_pending
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="argon2"
+        )
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingBusyError()
+
+        # Count the executor job itself, not the awaiting coroutine: a caller
+        # that is cancelled (client gone, request timed out) keeps its slot
+        # until the thread has actually finished with it
+        loop = asyncio.get_running_loop()
+        job = self.executor.submit(fn, *args)
+        self.pending += 1
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._done))
+        return await asyncio.wrap_future(job)
+
+    def _done(self):
+        self.pending -= 1
+        self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(verify_password, password, password_hash)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
 def create_access_token(user_id: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
     payload = {
@@ -47,3 +121,15 @@ def decode_token(token: str) -> dict | None:
         return payload
     except JWTError:
         return None
+
+
+# Global hashing pool instance
+_hashing_pool: HashingPool = None
+
+
+def get_hashing_pool() -> HashingPool:
+    """Get the global password hashing pool."""
+    global _hashing_pool
+    if _hashing_pool is None:
+        _hashing_pool = HashingPool()
+    return _hashing_pool
@@ -1,3 +1,4 @@
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -5,13 +6,24 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from api.v1.apps import router as apps_router
 from api.v1.auth import router as auth_router
+from api.ws import router as ws_router
 from apps.command_center import app as command_center_app
+from apps.command_center.audit import get_audit_sink, reconcile_audit_policies
 from apps.connection_manager import get_connection_manager
 from apps.framework.registry import get_registry
+from apps.ha_client import get_client_pool
+from apps.ha_gateway import get_gateway, publish_state_change
+from apps.realtime import get_hub, get_publisher
+from apps.telemetry import get_ingestor
 from core.config import settings
+from core.invalidation import get_invalidation_bus
+from core.pagination import NEXT_CURSOR_HEADER
+from core.security import get_hashing_pool
 from db.postgres import close_pool, init_pool
 from db.redis import close_redis, init_redis
 
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -19,10 +31,41 @@ async def lifespan(app: FastAPI):
     await init_pool()
     await init_redis()
 
+    # Start cross-worker cache invalidation
+    invalidation_bus = get_invalidation_bus()
+    await invalidation_bus.start()
+
+    # Apply audit log retention/compression settings
+    try:
+        await reconcile_audit_policies()
+    except Exception as e:
+        logger.error(f"Error applying audit log policies: {e}")
+
+    # Start the audit log writer
+    audit_sink = get_audit_sink()
+    await audit_sink.start()
+
     # Register apps
     registry = get_registry()
     registry.register(command_center_app)
 
+    # Start shared Home Assistant client pool
+    client_pool = get_client_pool()
+    await client_pool.start()
+
+    # Start realtime fan-out for WebSocket clients
+    hub = get_hub()
+    publisher = get_publisher()
+    await hub.start()
+    await publisher.start()
+    get_gateway().add_listener(publish_state_change)
+
+    # Start telemetry ingestion, fed by the gateway's state changes
+    ingestor = get_ingestor()
+    if settings.telemetry_enabled:
+        await ingestor.start()
+        get_gateway().add_listener(ingestor.submit)
+
     # Start connection manager
     connection_manager = get_connection_manager()
     await connection_manager.start()
@@ -31,6 +74,14 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     await connection_manager.stop()
+    await get_gateway().stop()
+    await ingestor.stop()
+    await audit_sink.stop()
+    await hub.stop()
+    await publisher.stop()
+    await client_pool.close()
+    await invalidation_bus.stop()
+    get_hashing_pool().close()
     await close_pool()
     await close_redis()
 
@@ -47,11 +98,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(apps_router, prefix="/api/v1")
+app.include_router(ws_router)
 
 # Mount command center routes
 app.include_router(
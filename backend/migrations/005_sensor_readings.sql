@@ -0,0 +1,19 @@
+-- UP
+CREATE EXTENSION IF NOT EXISTS timescaledb;
+
+CREATE TABLE sensor_readings (
+    time TIMESTAMPTZ NOT NULL,
+    controller_id UUID NOT NULL REFERENCES master_controllers(id) ON DELETE CASCADE,
+    entity_id VARCHAR(255) NOT NULL,
+    state VARCHAR(255),
+    attributes JSONB,
+    ingested_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT create_hypertable('sensor_readings', 'time', chunk_time_interval => INTERVAL '1 day');
+
+CREATE INDEX idx_sensor_readings_controller_entity_time
+    ON sensor_readings(controller_id, entity_id, time DESC);
+
+-- DOWN
+DROP TABLE IF EXISTS sensor_readings;
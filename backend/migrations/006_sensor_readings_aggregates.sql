@@ -0,0 +1,86 @@
+-- UP
+-- Numeric value of a reading, NULL for non-numeric states ("on", "unavailable", ...)
+CREATE FUNCTION sensor_state_numeric(state VARCHAR)
+RETURNS DOUBLE PRECISION
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT CASE
+        WHEN state ~ '^\s*-?[0-9]+(\.[0-9]+)?([eE][-+]?[0-9]+)?\s*$' THEN state::double precision
+    END
+$$;
+
+CREATE MATERIALIZED VIEW sensor_readings_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 minute', time) AS bucket,
+       controller_id,
+       entity_id,
+       count(*) AS samples,
+       count(sensor_state_numeric(state)) AS value_count,
+       sum(sensor_state_numeric(state)) AS value_sum,
+       min(sensor_state_numeric(state)) AS value_min,
+       max(sensor_state_numeric(state)) AS value_max
+FROM sensor_readings
+GROUP BY bucket, controller_id, entity_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW sensor_readings_5m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '5 minutes', time) AS bucket,
+       controller_id,
+       entity_id,
+       count(*) AS samples,
+       count(sensor_state_numeric(state)) AS value_count,
+       sum(sensor_state_numeric(state)) AS value_sum,
+       min(sensor_state_numeric(state)) AS value_min,
+       max(sensor_state_numeric(state)) AS value_max
+FROM sensor_readings
+GROUP BY bucket, controller_id, entity_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW sensor_readings_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', time) AS bucket,
+       controller_id,
+       entity_id,
+       count(*) AS samples,
+       count(sensor_state_numeric(state)) AS value_count,
+       sum(sensor_state_numeric(state)) AS value_sum,
+       min(sensor_state_numeric(state)) AS value_min,
+       max(sensor_state_numeric(state)) AS value_max
+FROM sensor_readings
+GROUP BY bucket, controller_id, entity_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW sensor_readings_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', time) AS bucket,
+       controller_id,
+       entity_id,
+       count(*) AS samples,
+       count(sensor_state_numeric(state)) AS value_count,
+       sum(sensor_state_numeric(state)) AS value_sum,
+       min(sensor_state_numeric(state)) AS value_min,
+       max(sensor_state_numeric(state)) AS value_max
+FROM sensor_readings
+GROUP BY bucket, controller_id, entity_id
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('sensor_readings_1m',
+    start_offset => INTERVAL '2 hours', end_offset => INTERVAL '1 minute',
+    schedule_interval => INTERVAL '1 minute');
+SELECT add_continuous_aggregate_policy('sensor_readings_5m',
+    start_offset => INTERVAL '6 hours', end_offset => INTERVAL '5 minutes',
+    schedule_interval => INTERVAL '5 minutes');
+SELECT add_continuous_aggregate_policy('sensor_readings_1h',
+    start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '30 minutes');
+SELECT add_continuous_aggregate_policy('sensor_readings_1d',
+    start_offset => INTERVAL '30 days', end_offset => INTERVAL '1 day',
+    schedule_interval => INTERVAL '1 hour');
+
+-- DOWN
+DROP MATERIALIZED VIEW IF EXISTS sensor_readings_1d;
+DROP MATERIALIZED VIEW IF EXISTS sensor_readings_1h;
+DROP MATERIALIZED VIEW IF EXISTS sensor_readings_5m;
+DROP MATERIALIZED VIEW IF EXISTS sensor_readings_1m;
+DROP FUNCTION IF EXISTS sensor_state_numeric(VARCHAR);
@@ -0,0 +1,16 @@
+-- UP
+CREATE TABLE controller_heartbeats (
+    time TIMESTAMPTZ NOT NULL,
+    controller_id UUID NOT NULL REFERENCES master_controllers(id) ON DELETE CASCADE,
+    status connection_status NOT NULL,  -- Status over the span, as the previous probe found it
+    rtt_ms REAL,                -- Probe round trip, NULL when the probe failed
+    span_seconds REAL NOT NULL  -- Time since the previous probe, for time-weighted uptime
+);
+
+SELECT create_hypertable('controller_heartbeats', 'time', chunk_time_interval => INTERVAL '1 day');
+
+CREATE INDEX idx_controller_heartbeats_controller_time
+    ON controller_heartbeats(controller_id, time DESC);
+
+-- DOWN
+DROP TABLE IF EXISTS controller_heartbeats;
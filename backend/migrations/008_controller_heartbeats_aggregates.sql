@@ -0,0 +1,44 @@
+-- UP
+-- Latency percentiles come from rtt_histogram: 50 equal buckets of ln(1 + rtt_ms)
+-- over [0, 10), i.e. about 22% relative resolution from 0 ms to ~22 s.
+-- Keep in sync with apps/heartbeat_history.py.
+CREATE MATERIALIZED VIEW controller_heartbeats_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', time) AS bucket,
+       controller_id,
+       count(*) AS probes,
+       sum(span_seconds) AS observed_seconds,
+       sum(CASE WHEN status = 'online' THEN span_seconds ELSE 0 END) AS online_seconds,
+       count(rtt_ms) AS rtt_count,
+       sum(rtt_ms) AS rtt_sum,
+       max(rtt_ms) AS rtt_max,
+       histogram(ln(1 + rtt_ms), 0.0, 10.0, 50) AS rtt_histogram
+FROM controller_heartbeats
+GROUP BY bucket, controller_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW controller_heartbeats_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', time) AS bucket,
+       controller_id,
+       count(*) AS probes,
+       sum(span_seconds) AS observed_seconds,
+       sum(CASE WHEN status = 'online' THEN span_seconds ELSE 0 END) AS online_seconds,
+       count(rtt_ms) AS rtt_count,
+       sum(rtt_ms) AS rtt_sum,
+       max(rtt_ms) AS rtt_max,
+       histogram(ln(1 + rtt_ms), 0.0, 10.0, 50) AS rtt_histogram
+FROM controller_heartbeats
+GROUP BY bucket, controller_id
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('controller_heartbeats_1h',
+    start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '30 minutes');
+SELECT add_continuous_aggregate_policy('controller_heartbeats_1d',
+    start_offset => INTERVAL '30 days', end_offset => INTERVAL '1 day',
+    schedule_interval => INTERVAL '1 hour');
+
+-- DOWN
+DROP MATERIALIZED VIEW IF EXISTS controller_heartbeats_1d;
+DROP MATERIALIZED VIEW IF EXISTS controller_heartbeats_1h;
@@ -0,0 +1,23 @@
+-- UP
+-- Composite indexes for keyset pagination on (created_at, id), alone or
+-- behind an action / user_id equality filter. They replace the
+-- single-column indexes, which they cover as leading columns.
+CREATE INDEX idx_cc_audit_logs_created_at_id
+    ON cc_audit_logs(created_at DESC, id DESC);
+CREATE INDEX idx_cc_audit_logs_action_created_at_id
+    ON cc_audit_logs(action, created_at DESC, id DESC);
+CREATE INDEX idx_cc_audit_logs_user_id_created_at_id
+    ON cc_audit_logs(user_id, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS idx_cc_audit_logs_created_at;
+DROP INDEX IF EXISTS idx_cc_audit_logs_action;
+DROP INDEX IF EXISTS idx_cc_audit_logs_user_id;
+
+-- DOWN
+CREATE INDEX IF NOT EXISTS idx_cc_audit_logs_user_id ON cc_audit_logs(user_id);
+CREATE INDEX IF NOT EXISTS idx_cc_audit_logs_action ON cc_audit_logs(action);
+CREATE INDEX IF NOT EXISTS idx_cc_audit_logs_created_at ON cc_audit_logs(created_at DESC);
+
+DROP INDEX IF EXISTS idx_cc_audit_logs_user_id_created_at_id;
+DROP INDEX IF EXISTS idx_cc_audit_logs_action_created_at_id;
+DROP INDEX IF EXISTS idx_cc_audit_logs_created_at_id;
@@ -0,0 +1,38 @@
+-- UP
+-- Hypertable unique indexes must include the time column, so the primary key
+-- becomes (created_at, id). It also serves keyset pagination, replacing the
+-- separate (created_at, id) index.
+ALTER TABLE cc_audit_logs DROP CONSTRAINT cc_audit_logs_pkey;
+ALTER TABLE cc_audit_logs ADD PRIMARY KEY (created_at, id);
+DROP INDEX IF EXISTS idx_cc_audit_logs_created_at_id;
+
+SELECT create_hypertable('cc_audit_logs', 'created_at',
+    chunk_time_interval => INTERVAL '7 days', migrate_data => true);
+
+ALTER TABLE cc_audit_logs SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'action',
+    timescaledb.compress_orderby = 'created_at DESC, id DESC'
+);
+
+-- Chunk interval, compression and retention policies are applied from
+-- settings at startup (apps/command_center/audit.py)
+
+-- DOWN
+SELECT remove_retention_policy('cc_audit_logs', if_exists => true);
+SELECT remove_compression_policy('cc_audit_logs', if_exists => true);
+
+CREATE TABLE cc_audit_logs_plain (LIKE cc_audit_logs INCLUDING DEFAULTS);
+INSERT INTO cc_audit_logs_plain SELECT * FROM cc_audit_logs;
+DROP TABLE cc_audit_logs;
+ALTER TABLE cc_audit_logs_plain RENAME TO cc_audit_logs;
+
+ALTER TABLE cc_audit_logs ADD PRIMARY KEY (id);
+ALTER TABLE cc_audit_logs
+    ADD FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL;
+CREATE INDEX idx_cc_audit_logs_created_at_id
+    ON cc_audit_logs(created_at DESC, id DESC);
+CREATE INDEX idx_cc_audit_logs_action_created_at_id
+    ON cc_audit_logs(action, created_at DESC, id DESC);
+CREATE INDEX idx_cc_audit_logs_user_id_created_at_id
+    ON cc_audit_logs(user_id, created_at DESC, id DESC);
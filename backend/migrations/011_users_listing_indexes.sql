@@ -0,0 +1,10 @@
+-- UP
+-- Keyset pagination on (created_at, id) and case-insensitive email prefix
+-- search for the user list. text_pattern_ops lets `lower(email) LIKE 'ab%'`
+-- use the index under any collation.
+CREATE INDEX idx_users_created_at_id ON users(created_at DESC, id DESC);
+CREATE INDEX idx_users_email_lower_prefix ON users(lower(email) text_pattern_ops);
+
+-- DOWN
+DROP INDEX IF EXISTS idx_users_email_lower_prefix;
+DROP INDEX IF EXISTS idx_users_created_at_id;
@@ -0,0 +1,272 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+
+import apps.connection_manager as connection_manager
+from apps.connection_manager import (
+    FETCH_RETRY_DELAY,
+    ConnectionManager,
+    ControllerSchedule,
+    HeartbeatResult,
+)
+from core.config import settings
+
+INTERVAL = 30
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(settings, "heartbeat_flap_interval", 10)
+    monkeypatch.setattr(settings, "heartbeat_flap_probes", 3)
+    monkeypatch.setattr(settings, "heartbeat_max_backoff", 600)
+    monkeypatch.setattr(settings, "heartbeat_breaker_threshold", 5)
+    monkeypatch.setattr(settings, "heartbeat_breaker_cooldown", 1800)
+    return ConnectionManager(interval=INTERVAL, jitter=0)
+
+
+def check(manager, controller_id, status, stored_status="online") -> float:
+    """Feed one result to _reschedule_after and return the delay it picked."""
+    before = time.monotonic()
+    manager._reschedule_after(
+        controller_id,
+        {"connection_status": stored_status},
+        HeartbeatResult(controller_id, status),
+    )
+    return manager.schedules[controller_id].next_due - before
+
+
+def assert_delay(delay: float, expected: float):
+    # _reschedule_after adds up to 10% jitter
+    assert expected <= delay <= expected * 1.1 + 0.1
+
+
+def test_pop_due_takes_only_due_controllers(manager):
+    now = time.monotonic()
+    manager._schedule(ControllerSchedule("a"), now - 1)
+    manager._schedule(ControllerSchedule("b"), now - 2)
+    manager._schedule(ControllerSchedule("c"), now + 60)
+
+    assert sorted(manager._pop_due()) == ["a", "b"]
+    assert manager._pop_due() == []
+    assert [controller_id for _, controller_id in manager._heap] == ["c"]
+
+
+def test_pop_due_skips_superseded_and_dropped_entries(manager):
+    now = time.monotonic()
+    schedule = ControllerSchedule("a")
+    manager._schedule(schedule, now - 5)
+    manager._schedule(schedule, now - 1)  # Rescheduled: the first entry is stale
+    manager._schedule(ControllerSchedule("b"), now - 1)
+    del manager.schedules["b"]
+
+    assert manager._pop_due() == ["a"]
+
+
+def test_online_controller_is_checked_every_interval(manager):
+    manager.schedules["a"] = ControllerSchedule("a", status="online")
+    assert_delay(check(manager, "a", "online"), INTERVAL)
+
+
+def test_failures_back_off_exponentially_up_to_the_cap(manager, monkeypatch):
+    monkeypatch.setattr(settings, "heartbeat_breaker_threshold", 100)
+    manager.schedules["a"] = ControllerSchedule("a", status="offline")
+
+    delays = [check(manager, "a", "offline", "offline") for _ in range(7)]
+
+    for delay, expected in zip(delays, [30, 60, 120, 240, 480, 600, 600]):
+        assert_delay(delay, expected)
+
+
+def test_breaker_opens_after_threshold_and_closes_when_online(manager):
+    manager.schedules["a"] = ControllerSchedule("a", status="offline")
+
+    for _ in range(4):
+        check(manager, "a", "offline", "offline")
+    assert not manager.schedules["a"].breaker_open
+
+    assert_delay(check(manager, "a", "offline", "offline"), 1800)
+    assert manager.schedules["a"].breaker_open
+
+    # Coming back online closes the breaker and starts fast re-checks
+    assert_delay(check(manager, "a", "online", "offline"), 10)
+    schedule = manager.schedules["a"]
+    assert not schedule.breaker_open
+    assert schedule.failures == 0
+
+
+def test_status_change_is_followed_by_fast_probes(manager):
+    manager.schedules["a"] = ControllerSchedule("a", status="online")
+
+    delays = [check(manager, "a", "offline")]
+    delays += [check(manager, "a", "offline", "offline") for _ in range(3)]
+
+    # Three fast re-checks, then the backoff schedule (4th failure: 8x interval)
+    for delay, expected in zip(delays, [10, 10, 10, 240]):
+        assert_delay(delay, expected)
+
+
+def test_open_breaker_cancels_fast_probes(manager):
+    manager.schedules["a"] = ControllerSchedule("a", status="online", failures=4)
+
+    assert_delay(check(manager, "a", "error"), 1800)
+    assert manager.schedules["a"].fast_probes == 0
+
+
+class FailingPool:
+    def acquire(self):
+        raise ConnectionError("database is down")
+
+
+async def test_due_controllers_are_rescheduled_when_the_fetch_fails(manager, monkeypatch):
+    monkeypatch.setattr(connection_manager, "get_pool", lambda: FailingPool())
+    now = time.monotonic()
+    manager._schedule(ControllerSchedule("a"), now - 1)
+    manager._schedule(ControllerSchedule("b"), now - 1)
+
+    assert await manager._check_due_controllers() == 0
+
+    assert manager._pop_due() == []
+    assert sorted(controller_id for _, controller_id in manager._heap) == ["a", "b"]
+    for _, controller_id in manager._heap:
+        assert_delay(manager.schedules[controller_id].next_due - now, FETCH_RETRY_DELAY)
+
+
+async def test_failing_fleet_reload_waits_an_interval(manager, monkeypatch):
+    calls = 0
+
+    async def failing_reload():
+        nonlocal calls
+        calls += 1
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(manager, "_reload_fleet", failing_reload)
+    manager.running = True
+    task = asyncio.create_task(manager._heartbeat_loop())
+    await asyncio.sleep(0.1)
+    manager.running = False
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert calls == 1
+    assert manager._next_reload > time.monotonic()
+
+
+def test_history_span_is_recorded_under_the_previous_status(manager, monkeypatch):
+    monkeypatch.setattr(settings, "heartbeat_history_enabled", True)
+    controller = {"id": "a", "connection_status": "offline"}
+    manager.schedules["a"] = ControllerSchedule("a")
+
+    # Offline, then the recovery probe long after
+    manager._record_history([controller], [HeartbeatResult("a", "offline")])
+    manager._reschedule_after("a", controller, HeartbeatResult("a", "offline"))
+    manager.schedules["a"].last_checked -= 1800
+    manager._record_history([controller], [HeartbeatResult("a", "online")])
+
+    first, recovery = manager._history
+    assert first[2] == "offline"
+    assert first[4] == INTERVAL
+    assert recovery[2] == "offline"
+    assert recovery[4] >= 1800
+
+
+class RowsPool:
+    """Stands in for the pool: every query returns one row per requested id."""
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def fetch(self, query, ids):
+        return [
+            {
+                "id": controller_id,
+                "user_id": None,
+                "url": "http://ha.local:8123",
+                "access_token_encrypted": "",
+                "connection_status": "online",
+                "last_seen": None,
+                "last_error": None,
+                "ha_version": "2026.1",
+            }
+            for controller_id in ids
+        ]
+
+
+async def test_slow_check_does_not_hold_back_other_controllers(manager, monkeypatch):
+    monkeypatch.setattr(connection_manager, "get_pool", lambda: RowsPool())
+    monkeypatch.setattr(settings, "heartbeat_history_enabled", False)
+    monkeypatch.setattr(settings, "heartbeat_result_flush_window", 0.05)
+    slow, fast_1, fast_2 = (str(uuid.uuid4()) for _ in range(3))
+    delays = {slow: 0.5, fast_1: 0.01, fast_2: 0.01}
+    started = time.monotonic()
+    checked_at = {}
+
+    async def check(controller):
+        controller_id = str(controller["id"])
+        await asyncio.sleep(delays[controller_id])
+        checked_at.setdefault(controller_id, time.monotonic() - started)
+        return HeartbeatResult(controller_id, "online")
+
+    async def reload_fleet():
+        pass
+
+    async def write_results(controllers, results):
+        return 0
+
+    monkeypatch.setattr(manager, "_check_with_timeout", check)
+    monkeypatch.setattr(manager, "_reload_fleet", reload_fleet)
+    monkeypatch.setattr(manager, "_write_results", write_results)
+    manager._schedule(ControllerSchedule(slow), started)
+    manager._schedule(ControllerSchedule(fast_1), started + 0.1)
+    manager._schedule(ControllerSchedule(fast_2), started + 0.2)
+
+    manager.running = True
+    task = asyncio.create_task(manager._heartbeat_loop())
+    await asyncio.sleep(0.7)
+    manager.running = False
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # Both fast controllers were checked while the slow one was still running
+    assert checked_at[fast_1] < 0.3
+    assert checked_at[fast_2] < 0.4
+    assert checked_at[slow] >= 0.5
+    assert manager.last_sweep is not None
+    assert not manager._in_flight
+
+
+async def test_reschedule_during_a_check_runs_it_again_afterwards(manager, monkeypatch):
+    monkeypatch.setattr(connection_manager, "get_pool", lambda: RowsPool())
+    monkeypatch.setattr(settings, "heartbeat_history_enabled", False)
+    controller_id = str(uuid.uuid4())
+    release = asyncio.Event()
+    checks = 0
+
+    async def check(controller):
+        nonlocal checks
+        checks += 1
+        await release.wait()
+        return HeartbeatResult(controller_id, "online")
+
+    monkeypatch.setattr(manager, "_check_with_timeout", check)
+    manager._schedule(ControllerSchedule(controller_id), time.monotonic())
+    assert await manager._check_due_controllers() == 1
+    await asyncio.sleep(0)
+
+    # Rescheduled while running: not started twice, but due again once it finishes
+    manager._schedule(ControllerSchedule(controller_id), time.monotonic())
+    assert await manager._check_due_controllers() == 0
+    release.set()
+    await asyncio.gather(*manager._checks)
+
+    assert checks == 1
+    assert manager._pop_due() == [controller_id]
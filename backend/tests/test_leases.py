@@ -0,0 +1,55 @@
+from apps.leases import WorkerLeases, rendezvous_owner
+
+KEYS = [f"controller-{i}" for i in range(1000)]
+
+
+def owners(workers: list[str]) -> dict[str, str]:
+    return {key: rendezvous_owner(workers, key) for key in KEYS}
+
+
+def test_no_workers_means_no_owner():
+    assert rendezvous_owner([], "controller-1") is None
+
+
+def test_owner_does_not_depend_on_worker_order():
+    workers = ["a", "b", "c"]
+    assert owners(workers) == owners(list(reversed(workers)))
+
+
+def test_keys_spread_across_workers():
+    counts = {}
+    for owner in owners(["a", "b", "c", "d"]).values():
+        counts[owner] = counts.get(owner, 0) + 1
+
+    assert set(counts) == {"a", "b", "c", "d"}
+    assert min(counts.values()) > len(KEYS) / 4 * 0.7
+
+
+def test_joining_worker_only_takes_keys():
+    before = owners(["a", "b", "c"])
+    after = owners(["a", "b", "c", "d"])
+
+    moved = {key for key in KEYS if before[key] != after[key]}
+    assert moved
+    assert all(after[key] == "d" for key in moved)
+
+
+def test_leaving_worker_only_gives_up_its_own_keys():
+    before = owners(["a", "b", "c", "d"])
+    after = owners(["a", "b", "d"])
+
+    for key in KEYS:
+        if before[key] == "c":
+            assert after[key] != "c"
+        else:
+            assert after[key] == before[key]
+
+
+def test_worker_owns_everything_until_it_sees_the_worker_list():
+    leases = WorkerLeases(lease_ttl=15)
+    assert all(leases.owns(key) for key in KEYS[:10])
+
+    leases.workers = sorted([leases.worker_id, "other"])
+    owned = [key for key in KEYS if leases.owns(key)]
+    assert 0 < len(owned) < len(KEYS)
+    assert all(rendezvous_owner(leases.workers, key) == leases.worker_id for key in owned)
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+import pytest
+
+from core.security import HashingBusyError, HashingPool
+
+
+@pytest.fixture
+def pool():
+    pool = HashingPool(workers=1, max_pending=2)
+    yield pool
+    pool.close()
+
+
+async def test_busy_pool_rejects_new_work(pool):
+    release = threading.Event()
+    jobs = [asyncio.create_task(pool._run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(HashingBusyError):
+        await pool._run(release.wait)
+    assert pool.rejected == 1
+
+    release.set()
+    await asyncio.gather(*jobs)
+    await asyncio.sleep(0)
+    assert pool.pending == 0
+    assert pool.completed == 2
+
+
+async def test_cancelled_caller_keeps_its_slot_until_the_thread_finishes(pool):
+    release = threading.Event()
+    started = threading.Event()
+
+    def work():
+        started.set()
+        release.wait()
+
+    job = asyncio.create_task(pool._run(work))
+    await asyncio.to_thread(started.wait)
+    job.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await job
+
+    assert pool.pending == 1
+
+    release.set()
+    for _ in range(100):
+        if pool.pending == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert pool.pending == 0
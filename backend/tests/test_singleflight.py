@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from apps.singleflight import SingleFlight
+
+
+@pytest.fixture
+def flight():
+    return SingleFlight(distributed=False)
+
+
+async def test_concurrent_calls_share_one_upstream_call(flight):
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"ok": True}
+
+    tasks = [asyncio.create_task(flight.do("states", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == [{"ok": True}] * 5
+    assert calls == 1
+    assert flight.upstream_calls == 1
+    assert flight.coalesced_calls == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+async def test_different_keys_do_not_coalesce(flight):
+    async def fetch():
+        await asyncio.sleep(0)
+        return 1
+
+    await asyncio.gather(flight.do("a", fetch), flight.do("b", fetch))
+    assert flight.upstream_calls == 2
+
+
+async def test_finished_calls_are_not_cached(flight):
+    async def fetch():
+        return 1
+
+    await flight.do("states", fetch)
+    await flight.do("states", fetch)
+    assert flight.upstream_calls == 2
+
+
+async def test_exception_reaches_leader_and_waiters(flight):
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        raise ConnectionError("unreachable")
+
+    tasks = [asyncio.create_task(flight.do("states", fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert flight.upstream_calls == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+async def test_waiter_takes_over_when_leader_is_cancelled(flight):
+    started = asyncio.Event()
+
+    async def hang():
+        started.set()
+        await asyncio.Event().wait()
+
+    async def fetch():
+        return "fresh"
+
+    leader = asyncio.create_task(flight.do("states", hang))
+    await started.wait()
+    waiter = asyncio.create_task(flight.do("states", fetch))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+    assert await waiter == "fresh"
+    assert flight.upstream_calls == 2
+    assert flight.stats()["in_flight"] == 0
+
+
+async def test_cancelled_waiter_does_not_cancel_the_leader(flight):
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "done"
+
+    leader = asyncio.create_task(flight.do("states", fetch))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(flight.do("states", fetch))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    release.set()
+    assert await leader == "done"
+    assert flight.upstream_calls == 1
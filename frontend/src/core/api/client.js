@@ -65,7 +65,18 @@ async function tryRefreshToken() {
 
 export async function apiJson(endpoint, options = {}) {
   const response = await api(endpoint, options)
+  return readJson(response)
+}
+
+// For keyset-paginated lists: the cursor for the next page comes back in
+// the X-Next-Cursor header, and is null on the last page
+export async function apiJsonPage(endpoint, options = {}) {
+  const response = await api(endpoint, options)
+  const items = await readJson(response)
+  return { items, nextCursor: response.headers.get('X-Next-Cursor') }
+}
 
+async function readJson(response) {
   if (!response.ok) {
     const error = await response.json().catch(() => ({ detail: 'Request failed' }))
     throw new Error(error.detail || 'Request failed')